@@ -1,12 +1,49 @@
-import streamlit as st
+import functools
+import html
 import random
-import json
-import streamlit.components.v1 as components
+import uuid
 
-import toml
-from pathlib import Path
+import streamlit as st
 
-CONFIG_PATH = Path(__file__).parent / ".streamlit" / "config.toml"
+import diagnostics
+from corpus import load_corpus
+from filters import filter_signature, cached_selection
+from grading import grade, marked_words
+from drills import LABELS, MODES, generate_questions
+from prefetch import prefetch
+from quiz import cached_questions, decode_quiz_code, encode_quiz_code, new_seed
+from rendering import answers_html, page_bounds
+from arabic import words
+from reviews import GRADES, card_weight, review_priorities, review_store, review_weights
+from sampling import SelectionWeights
+from search import MIN_QUERY_LENGTH, query_length, search_index
+from similar import neighbor_table
+from tokens import word_table
+from themes import THEMES, default_theme_name, theme_css
+
+# - Diagnostics (opt-in: QMT_DIAGNOSTICS=1, or QMT_DIAGNOSTICS=url and ?diagnostics=1) -
+diag_enabled = diagnostics.enabled_by_env() or (
+    diagnostics.url_switch_allowed() and st.query_params.get("diagnostics") == "1")
+if "diag_session" not in st.session_state:
+    st.session_state.diag_session = uuid.uuid4().hex[:8]
+    st.session_state.diag_history = []
+diag = diagnostics.start("rerun", st.session_state.diag_session, diag_enabled)
+
+
+def keep_diag_record(record):
+    st.session_state.diag_history = (st.session_state.diag_history + [record])[-20:]
+
+
+def timed_fragment(name):
+    # times a fragment as a phase of the full rerun, or on its own when it reruns alone
+    def wrap(fn):
+        @functools.wraps(fn)
+        def run(*args, **kwargs):
+            with diagnostics.timed(name, st.session_state.diag_session, diag_enabled,
+                                   on_record=keep_diag_record):
+                return fn(*args, **kwargs)
+        return run
+    return wrap
 
 
 st.markdown("""
@@ -21,6 +58,11 @@ st.markdown("""
   word-break: break-word;
   white-space: normal !important;
 }
+.typed-diff mark {
+  background: #C0392B;
+  color: #FFFFFF;
+  padding: 0 0.2em;
+}
 </style>
 """, unsafe_allow_html=True)
 
@@ -44,84 +86,6 @@ st.markdown("""
 
 
 
-# 1) your preset themes
-THEMES = {
-    "Teal": {
-        "base": "dark",
-        "primaryColor":             "#00FFFF",
-        "backgroundColor":          "#051716",
-        "secondaryBackgroundColor": "#062422",
-        "textColor":                "#FFFFFF",
-    },
-    "Blue": {
-        "base": "dark",
-        "primaryColor":             "#0059FF",
-        "backgroundColor":          "#050917",
-        "secondaryBackgroundColor": "#060C24",
-        "textColor":                "#FFFFFF",
-    },
-    "Purple": {
-        "base": "dark",
-        "primaryColor":             "#8A00FF",
-        "backgroundColor":          "#0D0517",
-        "secondaryBackgroundColor": "#120624",
-        "textColor":                "#FFFFFF",
-    },
-    "Magenta": {
-        "base": "dark",
-        "primaryColor":             "#FF00FF",
-        "backgroundColor":          "#160517",
-        "secondaryBackgroundColor": "#220624",
-        "textColor":                "#FFFFFF",
-    },
-    "Red": {
-        "base": "dark",
-        "primaryColor":             "#FF0030",
-        "backgroundColor":          "#170506",
-        "secondaryBackgroundColor": "#240607",
-        "textColor":                "#FFFFFF",
-    },
-    "Orange": {
-        "base": "dark",
-        "primaryColor":             "#FF6600",  # more saturated orange
-        "backgroundColor":          "#1A0E03",
-        "secondaryBackgroundColor": "#261503",
-        "textColor":                "#FFFFFF",
-    },
-    "Green": {
-        "base": "dark",
-        "primaryColor":             "#00FF66",  # rich neon green
-        "backgroundColor":          "#05170B",
-        "secondaryBackgroundColor": "#062415",
-        "textColor":                "#FFFFFF",
-    },
-    "Gold": {
-        "base": "dark",
-        "primaryColor":             "#FFD700",  # true gold
-        "backgroundColor":          "#171403",
-        "secondaryBackgroundColor": "#241E06",
-        "textColor":                "#FFFFFF",  # better contrast on gold
-    },
-}
-
-cfg = toml.load(CONFIG_PATH)
-current_colors = cfg.get("theme", {})
-
-def get_theme_name_by_colors(theme_dict):
-    for name, theme in theme_dict.items():
-        if all(theme.get(k) == current_colors.get(k) for k in ["primaryColor", "backgroundColor", "secondaryBackgroundColor", "textColor"]):
-            return name
-    return list(theme_dict.keys())[0]  # fallback to the first theme if none match
-
-current_theme_name = get_theme_name_by_colors(THEMES)
-
-def write_theme_to_config(theme_dict):
-    # load existing file (to preserve other settings)
-    cfg = toml.load(CONFIG_PATH)
-    cfg["theme"] = theme_dict
-    with open(CONFIG_PATH, "w") as f:
-        toml.dump(cfg, f)
-
 # — Custom Arabic‐only font styling —
 st.markdown("""
 <style>
@@ -153,59 +117,50 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# - Load Quran data -
-with open("master_quran.json", "r", encoding="utf-8") as f:
-    quran_data = json.load(f)
+diag.lap("css")
+
+# - Load Quran data (parsed once per process, shared by all sessions) -
+corpus = load_corpus()
+quran_data = corpus.ayahs
 
 # - Metadata for filters -
-surah_names = {a["surah"]: a["surah_name"] for a in quran_data}
-all_surah   = sorted({a["surah"] for a in quran_data})
-all_juzz    = sorted({a["juzz"]  for a in quran_data})
-all_quarter = sorted({a["quarter"] for a in quran_data})
+surah_names = corpus.surah_names
+all_surah   = corpus.all_surah
+all_juzz    = corpus.all_juzz
+all_quarter = corpus.all_quarter
+search_index(corpus)  # trigram index for the ayah search, also built once per process
+word_table(corpus)    # words of every ayah, for the word drills
+neighbor_table(corpus)  # look-alike ayahs: read from master_quran.sim, or built here when it is missing
+diag.lap("corpus")
 
 # - Title centered -
 st.markdown('<h1 style="text-align: center;">Quran Mastery Trainer</h1>', unsafe_allow_html=True)
 
-# - Filtering helpers -
-def in_ruku(a):
-    return any(a["juzz"]==j and s<=a["ruku"]<=e for j,s,e in st.session_state.get("active_ruku", []))
-
-def in_ayah(a):
-    return any(a["surah"]==s and s2<=a["ayah"]<=e2 for s,s2,e2 in st.session_state.get("active_ayah", []))
-
 # - Sidebar controls -
 
 
 st.sidebar.markdown("### Pick a theme")
-choice = st.sidebar.selectbox(
-    "Theme preset", 
-    list(THEMES.keys()), 
-    index=list(THEMES.keys()).index(current_theme_name)
-)
-
-# ← Replace your old Apply‐Theme block with this:
-if st.sidebar.button("Apply Theme"):
-    write_theme_to_config(THEMES[choice])
-    st.sidebar.success(f"Theme “{choice}” written. Refreshing…")
-
-    # inject JS that reloads the top‐level window, not just the iframe
-    components.html(
-        """
-        <script>
-          setTimeout(function() {
-            // reload the parent page (the Streamlit app itself)
-            window.parent.location.reload();
-          }, 1000);
-        </script>
-        """,
-        height=0,
-        width=0,
-    )
-    st.stop()
+if "theme" not in st.session_state:
+    st.session_state.theme = default_theme_name()
+# applied to this session only: no config write, no page reload
+st.sidebar.selectbox("Theme preset", list(THEMES.keys()), key="theme")
+st.markdown(theme_css(st.session_state.theme), unsafe_allow_html=True)
+diag.lap("theme")
 
 
 
-with st.sidebar:
+def drop_stale_prefetch(signature, mode):
+    # a prefetched set is only good for the filters and mode it was drawn for
+    pending = st.session_state.get("prefetch")
+    if pending is not None and not pending.matches(corpus, signature, mode):
+        pending.cancel()
+        st.session_state.prefetch = None
+
+
+# - Sidebar filters: a fragment, so editing them only reruns this panel -
+@st.fragment
+@timed_fragment("filters")
+def filter_panel():
     with st.expander("Manage Standard Filters", expanded=False):
         juzz_sel    = st.multiselect("Juzz",    all_juzz)
         quarter_sel = st.multiselect("Quarter", all_quarter)
@@ -222,7 +177,7 @@ with st.sidebar:
         r_end   = st.number_input("Ruku end",   min_value=1, step=1, key="rend2")
         r_juzz  = st.selectbox("Juzz for this Ruku range", all_juzz, key="rjuzz2")
         if st.button("Add Ruku Range", key="add_ruku"):
-            max_r = max(a["ruku"] for a in quran_data if a["juzz"] == r_juzz)
+            max_r = corpus.max_ruku[r_juzz]
             new_range = (r_juzz, r_start, r_end)
             if r_start > r_end:
                 st.error("Start must be ≤ end.")
@@ -259,24 +214,77 @@ with st.sidebar:
         st.session_state.ayah_ranges = [rng for rng, lab in zip(st.session_state.ayah_ranges, labels) if lab in active]
         st.session_state.active_ayah = st.session_state.ayah_ranges
 
+    # Compute filtered list: reused across reruns and sessions while the filters match
+    st.session_state.filter_signature = filter_signature(
+        juzz_sel, quarter_sel, surah_sel,
+        st.session_state.active_ruku,
+        st.session_state.active_ayah,
+    )
+    selection = cached_selection(corpus, st.session_state.filter_signature)
+    st.markdown(f"**Total matching ayahs: {len(selection.ayahs)}**")
+    drop_stale_prefetch(st.session_state.filter_signature, st.session_state.get("mode"))
+
+
+# - Ayah search: a fragment too, so typing does not rerun the page -
+SEARCH_RESULTS_SHOWN = 30
+
+
+@st.fragment
+@timed_fragment("search")
+def search_panel():
+    with st.expander("Find an Ayah", expanded=False):
+        query = st.text_input("Words from the ayah", key="search_query",
+                              placeholder="Type a few words, with or without tashkeel")
+        if not query.strip():
+            return
+        if query_length(query) < MIN_QUERY_LENGTH:
+            st.caption("Type a few more letters.")
+            return
+        found = search_index(corpus).find(query)
+        if not found:
+            st.caption("No ayah contains those words.")
+            return
+        keys = [f"{quran_data[i]['ayah_key']} ({quran_data[i]['surah_name']})" for i in found[:SEARCH_RESULTS_SHOWN]]
+        more = f" and {len(found) - SEARCH_RESULTS_SHOWN} more" if len(found) > SEARCH_RESULTS_SHOWN else ""
+        st.markdown(f"**Found in {len(found)}:** {', '.join(keys)}{more}")
+
+
+def load_quiz_code():
+    # callback, so the Mode radio can still be set before it is drawn
+    try:
+        signature, code_mode, seed, enabled = decode_quiz_code(st.session_state.quiz_code_input, corpus)
+        qs = cached_questions(corpus, signature, code_mode, seed, enabled)
+    except ValueError:
+        st.session_state.quiz_code_error = True
+        return
+    st.session_state.quiz_code_error = False
+    st.session_state.mode = code_mode
+    st.session_state.quiz_code = encode_quiz_code(signature, code_mode, seed, enabled)
+    st.session_state.questions = qs
+    st.session_state.revealed = {f"q{i}": 0 for i in range(len(qs))}
+    st.session_state.graded = set()
+    st.session_state.typed_results = {}
 
-    # Compute filtered list
-    filtered = [
-        a for a in quran_data
-        if ((juzz_sel    and a["juzz"]    in juzz_sel)
-         or (quarter_sel and a["quarter"] in quarter_sel)
-         or (surah_sel   and a["surah"]   in surah_sel)
-         or in_ruku(a)
-         or in_ayah(a))
-    ]
-    filtered_sorted = sorted(filtered, key=lambda x: (x["surah"], x["ayah"]))
 
-    st.markdown(f"**Total matching ayahs: {len(filtered_sorted)}**")
+with st.sidebar:
+    filter_panel()
+    search_panel()
     st.markdown("---")
     gen = st.button("Generate Challenge Questions")
-    mode = st.radio("Mode", options=["Study Mode", "Test Mode"], index=0, key="mode")
+    mode = st.radio("Mode", options=list(MODES), index=0, key="mode")
     include_info = st.checkbox("Include Ayah Info", value=False)
+    typed = st.checkbox("Type answers to grade them", key="typed_recall")
+    st.text_input("Your name", key="user", placeholder="Save review grades under this name")
+    st.markdown("---")
+    st.text_input("Quiz code", key="quiz_code_input", placeholder="Paste a shared quiz code")
+    st.button("Load Quiz", on_click=load_quiz_code)
+    if st.session_state.get("quiz_code_error"):
+        st.error("❗ That quiz code is not valid.")
 
+diag.lap("sidebar")
+selection = cached_selection(corpus, st.session_state.filter_signature)
+drop_stale_prefetch(st.session_state.filter_signature, mode)
+diag.lap("selection")
 
 
 # - Initialize session state -
@@ -284,550 +292,150 @@ if "questions" not in st.session_state:
     st.session_state.questions = []
 if "revealed" not in st.session_state:
     st.session_state.revealed = {}
+if "graded" not in st.session_state:
+    st.session_state.graded = set()  # (question, answer) pairs already graded
+if "typed_results" not in st.session_state:
+    st.session_state.typed_results = {}  # (question, answer) -> (grading.Grade, typed text)
 
-# - Friendly labels for drill types -
-LABELS = {
-    "random_keys": "Random Ayahs",
-    "random_keys_following": "Random Ayahs (Following)",
-    "random_keys_previous": "Random Ayahs (Previous)",
-    "range_drill": "Limited Range Recital",
-    "reverse_range_drill": "Reverse Limited Range Recital",
-    "ruku_drill": "Ruku Recital",
-    "ruku_last_drill": "Ruku Last Recital",
-    "next_ruku_first_drill": "Next Ruku Recital",
-    "next_ruku_last_drill": "Next Ruku First Ayah Drill",
-    "skip_ayah_drill": "Ayah Intervals"
-}
+def session_weights(user, signature, selection):
+    # built once per user and selection; grades then update it in place
+    if st.session_state.get("weights_key") != (user, signature):
+        st.session_state.weights = SelectionWeights(selection, review_weights(review_store(), user, corpus))
+        st.session_state.weights_key = (user, signature)
+    return st.session_state.weights
 
-# - Fixed sequence of question types -
-QUESTION_TYPE_ORDER = [
-    "random_keys",
-    "random_keys_following",
-    "random_keys_previous",
-    "range_drill",
-    "reverse_range_drill",
-    "ruku_drill",
-    "ruku_last_drill",
-    "next_ruku_first_drill",
-    "next_ruku_last_drill",
-  "skip_ayah_drill"
-
-]
 
 # - Generate questions on click -
 if gen:
-    if not filtered_sorted:
+    if not selection.ayahs:
         st.error("❗ Please select a range (Juzz, Surah, Quarter, Ruku, or Ayah range) **before** generating questions!")
+        if diag_enabled:
+            # the panel below will not run; end this rerun's timer so fragment reruns get their own
+            keep_diag_record(diag.finish())
         st.stop()  # Prevents any further code from running (including accidental clearing of questions!)
-    qs = []
-    total = len(filtered_sorted)
-
-# - Generate questions on click -
-if gen:
-    qs = []
-    total = len(filtered_sorted)
-
-    # Q1: Random Ayahs
-    if "random_keys" in QUESTION_TYPE_ORDER:
-        if mode == "Study Mode":
-            picks = filtered_sorted.copy()
-            random.shuffle(picks)
-        else:
-            count = min(int(0.6 * total), 20)
-            picks = random.sample(filtered_sorted, count)
-            random.shuffle(picks)
-        keys = [p["ayah_key"] for p in picks]
-        qs.append({
-            "type": "random_keys",
-            "content": f"Recite the following ayahs: {', '.join(keys)}",
-            "answers": picks
-        })
-
-    # Q2: Random Ayahs (Following)
-    if "random_keys_following" in QUESTION_TYPE_ORDER:
-        if mode == "Study Mode":
-            working = filtered_sorted.copy()
-            random.shuffle(working)
-        else:
-            count = min(int(0.6 * total), 20)
-            working = random.sample(filtered_sorted, count)
-            random.shuffle(working)
-        # exclude last ayah since no following
-        picks = [a for a in working
-                 if next((i for i, x in enumerate(filtered_sorted)
-                          if x["ayah_key"] == a["ayah_key"]), total-1) < total-1]
-        keys = [p["ayah_key"] for p in picks]
-        answers = []
-        for p in picks:
-            idx = next(i for i, a in enumerate(filtered_sorted)
-                       if a["ayah_key"] == p["ayah_key"])
-            answers.append(filtered_sorted[idx+1])
-        qs.append({
-            "type": "random_keys_following",
-            "content": f"Recite the ayah following these ayahs: {', '.join(keys)}",
-            "answers": answers
-        })
-
-    # Q3: Random Ayahs (Previous)
-    if "random_keys_previous" in QUESTION_TYPE_ORDER:
-        if mode == "Study Mode":
-            working = filtered_sorted.copy()
-            random.shuffle(working)
-        else:
-            count = min(int(0.6 * total), 20)
-            working = random.sample(filtered_sorted, count)
-            random.shuffle(working)
-        # exclude first ayah since no previous
-        picks = [a for a in working
-                 if next((i for i, x in enumerate(filtered_sorted)
-                          if x["ayah_key"] == a["ayah_key"]), 0) > 0]
-        keys = [p["ayah_key"] for p in picks]
-        answers = []
-        for p in picks:
-            idx = next(i for i, a in enumerate(filtered_sorted)
-                       if a["ayah_key"] == p["ayah_key"])
-            answers.append(filtered_sorted[idx-1])
-        qs.append({
-            "type": "random_keys_previous",
-            "content": f"Recite the ayah preceding these ayahs: {', '.join(keys)}",
-            "answers": answers
-        })
-
-    # Q4: Limited Range Recital
-    if "range_drill" in QUESTION_TYPE_ORDER:
-        if mode == "Study Mode":
-            # 1. Pick a single random ayah
-            pick = random.choice(filtered_sorted)
-            start_key = pick["ayah_key"]
-            j, r = pick["juzz"], pick["ruku"]
-
-            # 2. Look for all verses in the next ruku within the filtered range
-            next_ruku = r + 1
-            next_ruku_verses = [
-                a for a in filtered_sorted
-                if a["juzz"] == j and a["ruku"] == next_ruku
-            ]
-
-            if next_ruku_verses:
-                # 3a. If the next ruku exists, end at its last ayah
-                end_key = next_ruku_verses[-1]["ayah_key"]
-                start_idx = next(i for i, a in enumerate(filtered_sorted)
-                                 if a["ayah_key"] == start_key)
-                end_idx = next(i for i, a in enumerate(filtered_sorted)
-                               if a["ayah_key"] == end_key)
-                answers = filtered_sorted[start_idx:end_idx+1]
-                content = (
-                    f"Recite from ayah {start_key} until the end of the next ruku "
-                    f"– ayah {end_key}."
-                )
-            else:
-                # 3b. Otherwise end at the very end of the selected range
-                end_key = filtered_sorted[-1]["ayah_key"]
-                start_idx = next(i for i, a in enumerate(filtered_sorted)
-                                 if a["ayah_key"] == start_key)
-                answers = filtered_sorted[start_idx:]
-                content = (
-                    f"Recite from ayah {start_key} till the end of the selected range "
-                    f"– ayah {end_key}."
-                )
-
-            qs.append({
-                "type": "range_drill",
-                "content": content,
-                "answers": answers
-            })
-        else:
-            # Test Mode logic: Limited Range Recital to next quarter (with wrap)
-            pick = random.choice(filtered_sorted)
-            start_key = pick["ayah_key"]
-            j = pick["juzz"]
-            current_quarter = int(pick.get("quarter"))
-            # Determine next quarter and adjust juzz if wrapping
-            if current_quarter < 4:
-                next_quarter = current_quarter + 1
-                next_juzz = j
-            else:
-                next_quarter = 1
-                next_juzz = j + 1
-
-            # Find verses in the next quarter using full Quran data
-            next_quarter_verses = [
-                a for a in quran_data
-                if a["juzz"] == next_juzz and int(a.get("quarter", 0)) == next_quarter
-            ]
-
-            if next_quarter_verses:
-                end_key = next_quarter_verses[-1]["ayah_key"]
-                start_idx = next(i for i, a in enumerate(quran_data)
-                                 if a["ayah_key"] == start_key)
-                end_idx = next(i for i, a in enumerate(quran_data)
-                               if a["ayah_key"] == end_key)
-                answers = quran_data[start_idx:end_idx+1]
-                content = (
-                    f"Recite from ayah {start_key} to the end of the next quarter "
-                    f"– ayah {end_key}."
-                )
-            else:
-                # Fallback to end of selected range
-                end_key = filtered_sorted[-1]["ayah_key"]
-                start_idx = next(i for i, a in enumerate(filtered_sorted)
-                                 if a["ayah_key"] == start_key)
-                answers = filtered_sorted[start_idx:]
-                content = (
-                    f"Recite from ayah {start_key} till the end of the selected range "
-                    f"– ayah {end_key}."
-                )
-
-            qs.append({
-                "type": "range_drill",
-                "content": content,
-                "answers": answers
-            })
-
-    # Q5: Reverse Limited Range Recital
-    if "reverse_range_drill" in QUESTION_TYPE_ORDER:
-        if mode == "Study Mode":
-            pick = random.choice(filtered_sorted)
-            start_key = pick["ayah_key"]
-            j, r = pick["juzz"], pick["ruku"]
-            prev_ruku = r - 1
-            if prev_ruku >= 1:
-                prev_ruku_verses = [
-                    a for a in filtered_sorted if a["juzz"] == j and a["ruku"] == prev_ruku
-                ]
-                end_key = prev_ruku_verses[0]["ayah_key"]
-                start_idx = next(i for i, a in enumerate(filtered_sorted)
-                                 if a["ayah_key"] == start_key)
-                end_idx = next(i for i, a in enumerate(filtered_sorted)
-                               if a["ayah_key"] == end_key)
-                answers = filtered_sorted[end_idx:start_idx+1]
-                content = (f"Recite backwards from ayah {start_key} to the start of the previous ruku "
-                           f"– ayah {end_key}.")
-            else:
-                end_key = filtered_sorted[0]["ayah_key"]
-                start_idx = next(i for i, a in enumerate(filtered_sorted)
-                                 if a["ayah_key"] == start_key)
-                answers = filtered_sorted[0:start_idx+1]
-                content = (f"Recite backwards from ayah {start_key} till the start of the selected range "
-                           f"– ayah {end_key}.")
-            answers = list(reversed(answers))
-            qs.append({"type": "reverse_range_drill", "content": content, "answers": answers})
-        else:
-            pick = random.choice(filtered_sorted)
-            start_key = pick["ayah_key"]
-            j = pick["juzz"]
-            current_quarter = int(pick.get("quarter"))
-            if current_quarter > 1:
-                prev_quarter = current_quarter - 1
-                prev_juzz = j
-            else:
-                prev_quarter = 4
-                prev_juzz = j - 1
-            prev_quarter_verses = [
-                a for a in quran_data if a["juzz"] == prev_juzz and int(a.get("quarter", 0)) == prev_quarter
-            ]
-            if prev_quarter_verses:
-                end_key = prev_quarter_verses[0]["ayah_key"]
-                start_idx = next(i for i, a in enumerate(quran_data)
-                                 if a["ayah_key"] == start_key)
-                end_idx = next(i for i, a in enumerate(quran_data)
-                               if a["ayah_key"] == end_key)
-                answers = quran_data[end_idx:start_idx+1]
-                content = (f"Recite backwards from ayah {start_key} to the start of the previous quarter "
-                           f"– ayah {end_key}.")
-            else:
-                end_key = filtered_sorted[0]["ayah_key"]
-                start_idx = next(i for i, a in enumerate(filtered_sorted)
-                                 if a["ayah_key"] == start_key)
-                answers = filtered_sorted[0:start_idx+1]
-                content = (f"Recite backwards from ayah {start_key} till the start of the selected range "
-                           f"– ayah {end_key}.")
-            answers = list(reversed(answers))
-            qs.append({"type": "reverse_range_drill", "content": content, "answers": answers})
-
-    # Q6: Ruku Drill
-    if "ruku_drill" in QUESTION_TYPE_ORDER:
-        # Collect unique (juzz, ruku) pairs in the filtered selection
-        all_pairs = [(v["juzz"], v["ruku"]) for v in filtered_sorted]
-        seen = set()
-        pairs = []
-        for pair in all_pairs:
-            if pair not in seen:
-                seen.add(pair)
-                pairs.append(pair)
-
-        if mode == "Study Mode":
-            # Every ruku in a random order
-            random.shuffle(pairs)
-            picks = pairs
-        else:
-            # Test Mode: if <=8 rukus, shuffle all; otherwise pick 8-10 randomly
-            total_pairs = len(pairs)
-            if total_pairs <= 8:
-                picks = pairs.copy()
-                random.shuffle(picks)
-            else:
-                count = random.randint(8, 10)
-                picks = random.sample(pairs, count)
-
-        # Content: list Juzz & Ruku pairs
-        keys = [f"J{j}-R{r}" for j, r in picks]
-        content = f"Recite the first 5 ayahs of the following rukus: {', '.join(keys)}"
-
-        # Answers: first 5 ayahs of each
-        answers = []
-        for j, r in picks:
-            ayahs = [a for a in filtered_sorted if a["juzz"] == j and a["ruku"] == r]
-            answers.extend(ayahs[:5])
-
-        qs.append({
-            "type": "ruku_drill",
-            "content": content,
-            "answers": answers
-        })
-
-# Q7: Ruku Last Ayahs Drill
-    if "ruku_last_drill" in QUESTION_TYPE_ORDER:
-        # Collect unique (juzz, ruku) pairs in the filtered selection
-        all_pairs = [(v["juzz"], v["ruku"]) for v in filtered_sorted]
-        seen = set()
-        pairs = []
-        for pair in all_pairs:
-            if pair not in seen:
-                seen.add(pair)
-                pairs.append(pair)
-
-        if mode == "Study Mode":
-            random.shuffle(pairs)
-            picks = pairs
-        else:
-            total_pairs = len(pairs)
-            if total_pairs <= 8:
-                picks = pairs.copy()
-                random.shuffle(picks)
-            else:
-                count = random.randint(8, 10)
-                picks = random.sample(pairs, count)
-
-        # Content: list Juzz & Ruku pairs
-        keys = [f"J{j}-R{r}" for j, r in picks]
-        content = f"Recite the last 5 ayahs of the following rukus: {', '.join(keys)}"
-
-        # Answers: last 5 ayahs of each
-        answers = []
-        for j, r in picks:
-            ayahs = [a for a in filtered_sorted if a["juzz"] == j and a["ruku"] == r]
-            answers.extend(ayahs[-5:])
-
-        qs.append({
-            "type": "ruku_last_drill",
-            "content": content,
-            "answers": answers
-        })
-
-    # Q8: Next Ruku First Ayah Drill (fixed to avoid empty picks)
-    if "next_ruku_first_drill" in QUESTION_TYPE_ORDER:
-        # 1) Build de‐duplicated list of (juzz, ruku)
-        all_pairs = [(v["juzz"], v["ruku"]) for v in filtered_sorted]
-        seen = set(); pairs = []
-        for p in all_pairs:
-            if p not in seen:
-                seen.add(p)
-                pairs.append(p)
-
-        # 2) If there's no “next” ruku at all, skip this question
-        if len(pairs) < 2:
-            # nothing to quiz on
-            pass
-        else:
-            # 3) Only pick among those with at least one successor
-            valid_starts = pairs[:-1]
-            start_j, start_r = random.choice(valid_starts)
-            idx = pairs.index((start_j, start_r))
-
-            # 4) Determine how many next rukus to include
-            if mode == "Study Mode":
-                picks = pairs[idx+1:]
-            else:
-                remaining = len(pairs) - (idx + 1)
-                if remaining < 3:
-                    picks = pairs[idx+1:]
-                else:
-                    x = random.randint(3, min(10, remaining))
-                    picks = pairs[idx+1 : idx+1 + x]
-
-            # 5) Build prompt (only shows the very next one)
-            count = len(picks)
-            first_j, first_r = picks[0]
-            content = (
-                f"Recite the first ayah of the next {count} rukus starting from "
-                f"J{first_j} Ruku {first_r}"
-            )
-
-            # 6) Gather answers for all picks
-            answers = []
-            for j, r in picks:
-                ay = next((a for a in filtered_sorted 
-                           if a["juzz"]==j and a["ruku"]==r), None)
-                if ay:
-                    answers.append(ay)
-
-            qs.append({
-                "type":    "next_ruku_first_drill",
-                "content": content,
-                "answers": answers
-            })
-
-    # Q9: Last Ruku Last Ayah Drill
-    if "next_ruku_last_drill" in QUESTION_TYPE_ORDER:
-        # 1) Build a de‐duplicated list of (juzz, ruku) pairs
-        all_pairs = [(v["juzz"], v["ruku"]) for v in filtered_sorted]
-        seen = set()
-        pairs = []
-        for p in all_pairs:
-            if p not in seen:
-                seen.add(p)
-                pairs.append(p)
-
-        # 2) If there's fewer than 2 rukus, skip (no “next” to ask)
-        if len(pairs) < 2:
-            pass
-        else:
-            # 3) Only pick starting points that have at least one successor
-            valid_starts = pairs[:-1]
-            start_j, start_r = random.choice(valid_starts)
-            idx = pairs.index((start_j, start_r))
-
-            # 4) Select which “next” rukus to quiz on
-            if mode == "Study Mode":
-                picks = pairs[idx+1:]
-            else:
-                remaining = len(pairs) - (idx + 1)
-                if remaining < 3:
-                    picks = pairs[idx+1:]
-                else:
-                    x = random.randint(3, min(10, remaining))
-                    picks = pairs[idx+1 : idx+1 + x]
-
-            # 5) Build the prompt (showing only the very next ruku)
-            count = len(picks)
-            first_j, first_r = picks[0]
-            content = (
-                f"Recite the last ayah of the next {count} rukus: "
-                f"J{first_j} Ruku {first_r}"
-            )
-
-            # 6) Gather the correct answers (last ayah of each picked ruku)
-            answers = []
-            for j, r in picks:
-                ayahs = [a for a in filtered_sorted if a["juzz"] == j and a["ruku"] == r]
-                if ayahs:
-                    answers.append(ayahs[-1])
-
-            qs.append({
-                "type":    "next_ruku_last_drill",
-                "content": content,
-                "answers": answers
-            })
-
-    # Q10: Every Nth Ayah Drill
-    if "skip_ayah_drill" in QUESTION_TYPE_ORDER:
-        ayahs = filtered_sorted  # list of all ayah dicts in order
-
-        # only proceed if there's at least one “next” ayah
-        if len(ayahs) > 1:
-            # 1) pick a start ayah (never the very last one)
-            start = random.choice(ayahs[:-1])
-            idx   = ayahs.index(start)
-
-            # 2) pick a step x between 2 and 5
-            step = random.randint(2, 5)
-
-            # 3) decide how many to collect
-            max_count = 5 if mode == "Study Mode" else 10
-
-            # 4) gather every step-th ayah
-            picks = []
-            pos   = idx
-            while pos < len(ayahs) and len(picks) < max_count:
-                picks.append(ayahs[pos])
-                pos += step
-
-            # how many we actually got
-            count = len(picks)
-
-            # build the ordinal suffix
-            suffix_map = {1: "st", 2: "nd", 3: "rd"}
-            suffix     = suffix_map.get(step, "th")
-            ordinal    = f"{step}{suffix}"
-
-            # starting point
-            s, a = start["surah"], start["ayah"]
-
-            # ending point
-            last_s, last_a = picks[-1]["surah"], picks[-1]["ayah"]
-
-            # 5) build the prompt: mention either the count or that it runs to the end of range
-            if count < max_count:
-                content = (
-                    f"Recite every {ordinal} ayah from {s}:{a} "
-                    f"until the end of the selected range (ending at {last_s}:{last_a})"
-                )
-            else:
-                content = (
-                    f"Recite every {ordinal} ayah from {s}:{a} for {count} ayahs"
-                )
-
-            # 6) append to your questions
-            qs.append({
-                "type":    "skip_ayah_drill",
-                "content": content,
-                "answers": picks
-            })
+    seed = new_seed()
+    user = st.session_state.user.strip()
+    priority = review_priorities(review_store(), user, corpus) if user else None
+    pending = st.session_state.pop("prefetch", None)  # used up either way
+    if priority:
+        if pending is not None:
+            pending.cancel()
+        # due and weak reviews first, the rest weighted by past mistakes:
+        # a personal set, so no cache and no quiz code
+        weights = session_weights(user, st.session_state.filter_signature, selection)
+        qs = generate_questions(corpus, selection, mode, rng=random.Random(seed),
+                                priority=priority, weights=weights)
+        st.session_state.quiz_code = None
+    else:
+        # same filters + mode + seed -> same questions, for every session;
+        # a prefetched seed is usually in the cache already
+        ready = pending.ready_seed() if pending is not None else None
+        if ready is not None:
+            seed = ready
+        qs = cached_questions(corpus, st.session_state.filter_signature, mode, seed)
+        st.session_state.quiz_code = encode_quiz_code(st.session_state.filter_signature, mode, seed)
 
     # Save and reset reveal counters
     st.session_state.questions = qs
     st.session_state.revealed = {f"q{i}": 0 for i in range(len(qs))}
+    st.session_state.graded = set()
+    st.session_state.typed_results = {}
+diag.lap("generate")
 
 
 # - Render questions & answers -
 
-def render_question(i, q):
+def grade_answer(user, index, drill, quality, graded_key):
+    # callback: the grade buttons are gone by the time the fragment redraws
+    ease, _, _, lapses, _ = review_store().record(user, quran_data[index]["ayah_key"], drill, quality)
+    if st.session_state.get("weights_key", (None,))[0] == user:
+        st.session_state.weights.update(drill, index, card_weight(ease, lapses))
+    st.session_state.graded.add(graded_key)
+
+
+def check_typed(i, q, n):
+    # callback: grade the typed ayah, then reveal it as Reveal Next would
+    index = q.answers[n]
+    # kept with the grade: the text area's state goes once the next one replaces it
+    typed_text = st.session_state.get(f"typed_{i}_{n}", "")
+    result = grade(corpus, index, typed_text)
+    st.session_state.typed_results[(i, n)] = (result, typed_text)
+    st.session_state.revealed[f"q{i}"] = n + 1
+    st.session_state[f"answers_page_{i}"] = page_bounds(n + 1, 1)[0]
+    user = st.session_state.user.strip()
+    if user:
+        grade_answer(user, index, q.type, result.quality, (i, n))
+
+
+def typed_result_html(result, typed_text, index):
+    if result.first_difference is None:
+        return f"<div class='typed-diff'>✅ Exact ({result.reference_words} words).</div>"
+    summary = (f"{result.accuracy:.0%} – {result.distance} word edit(s) from "
+               f"{quran_data[index]['ayah_key']}. First difference at word {result.first_difference + 1}")
+    if result.first_difference >= result.reference_words:
+        return f"<div class='typed-diff'>{summary}: the ayah ends there.</div>"
+    before, word, after = marked_words(quran_data[index]["text"], result.first_difference)
+    typed_words = words(typed_text)
+    wrote = typed_words[result.first_difference] if result.first_difference < len(typed_words) else "nothing"
+    return (f"<div class='typed-diff'>{summary} – you wrote {html.escape(wrote)}:"
+            f"<div dir='rtl' style='text-align: center;'>{before} <mark>{word}</mark> {after}</div></div>")
+
+
+# Each question is a fragment: its Reveal buttons rerun only that question
+@st.fragment
+@timed_fragment("render")
+def render_question(i, q, include_info, typed):
     key = f"q{i}"
     if key not in st.session_state.revealed:
         st.session_state.revealed[key] = 0
 
-    qtype = LABELS[q["type"]]
+    qtype = LABELS[q.type]
     with st.expander(f"Question {i+1} – {qtype}", expanded=True):
         # Question prompt styled
         st.markdown(
-            f'<div class="question-prompt">{q["content"]}</div>',
+            f'<div class="question-prompt">{q.content}</div>',
             unsafe_allow_html=True
         )
 
         # four cols: big, button, button, big
         col0, col1, col2, col3 = st.columns([1.7,1,1,1.5])
+        page_key = f"answers_page_{i}"
+        revealed = False
         if col1.button("Reveal Next", key=f"btn_next_{i}"):
             cur = st.session_state.revealed[key]
-            st.session_state.revealed[key] = min(cur + 1, len(q["answers"]))
+            st.session_state.revealed[key] = min(cur + 1, len(q.answers))
+            revealed = True
         if col2.button("Reveal All", key=f"btn_all_{i}"):
-            st.session_state.revealed[key] = len(q["answers"])
+            st.session_state.revealed[key] = len(q.answers)
+            revealed = True
 
         to_show = st.session_state.revealed[key]
+        if typed and to_show < len(q.answers):
+            st.text_area(f"Type answer {to_show + 1} of {len(q.answers)}", key=f"typed_{i}_{to_show}")
+            st.button("Check", key=f"check_{i}_{to_show}", on_click=check_typed, args=(i, q, to_show))
         if to_show > 0:
             st.markdown("---")
-            for a in q["answers"][:to_show]:
-                if include_info:
-                    meta = f"Juzz {a['juzz']}, Ruku {a['ruku']}, Ayah {a['ayah_key']} <br>"
-                    html  = f"<div class='ayah-meta'>{meta}</div>"
-                    html += "<div dir='rtl' style='text-align: center; margin-bottom:1em;'>"
-                    html += a['text']
-                    html += "</div>"
-                else:
-                    html  = "<div dir='rtl' style='text-align: center; margin-bottom:1em;'>"
-                    html += f"{a['text']} - ({a['ayah_key']})"
-                    html += "</div>"
-                st.markdown(html, unsafe_allow_html=True)
+            checked = st.session_state.typed_results.get((i, to_show - 1))
+            if checked is not None:
+                st.markdown(typed_result_html(*checked, q.answers[to_show - 1]), unsafe_allow_html=True)
+            # one HTML block per page of answers; a reveal jumps to the newest page
+            pages, _, _ = page_bounds(to_show, 1)
+            if revealed or st.session_state.get(page_key, 1) > pages:
+                st.session_state[page_key] = pages
+            if pages > 1:
+                st.number_input(f"Answers page (of {pages})", min_value=1, max_value=pages, key=page_key)
+            _, start, stop = page_bounds(to_show, st.session_state.get(page_key, 1))
+            st.markdown(answers_html(corpus, q.answers[start:stop], include_info), unsafe_allow_html=True)
+
+            # grade the latest revealed ayah for spaced repetition
+            user = st.session_state.user.strip()
+            n = to_show - 1
+            if user and (i, n) not in st.session_state.graded:
+                ayah_key = quran_data[q.answers[n]]["ayah_key"]
+                st.caption(f"How well did you recall {ayah_key}?")
+                for col, (label, quality) in zip(st.columns(len(GRADES)), GRADES.items()):
+                    col.button(label, key=f"grade_{i}_{n}_{label}", on_click=grade_answer,
+                               args=(user, q.answers[n], q.type, quality, (i, n)))
 
 
 
@@ -835,5 +443,25 @@ def render_question(i, q):
 # - Display if questions exist -
 if st.session_state.questions:
     st.markdown('<h2 style="text-align: center;">Your Challenge Questions</h2>', unsafe_allow_html=True)
+    if st.session_state.get("quiz_code"):
+        st.caption(f"Quiz code: `{st.session_state.quiz_code}` – share it to give someone the same questions.")
     for idx, q in enumerate(st.session_state.questions):
-        render_question(idx, q)
+        render_question(idx, q, include_info, typed)
+    # draw the next set in the background, so the next click only swaps it in;
+    # personal sets (no quiz code) depend on grades still to come
+    if st.session_state.get("quiz_code") and selection.ayahs and st.session_state.get("prefetch") is None:
+        st.session_state.prefetch = prefetch(corpus, st.session_state.filter_signature, mode)
+diag.lap("questions")
+
+# - Diagnostics panel -
+if diag_enabled:
+    keep_diag_record(diag.finish())
+    with st.sidebar.expander("Diagnostics", expanded=False):
+        last = st.session_state.diag_history[-1]
+        st.caption(f"Last rerun {last['total_ms']:.1f} ms; every rerun is appended to diagnostics.jsonl")
+        st.table({"phase": list(last["phases"]), "ms": [round(ms, 2) for ms in last["phases"].values()]})
+        fragments = [r for r in st.session_state.diag_history if r["kind"] == "fragment"][-5:]
+        if fragments:
+            st.caption("Recent fragment reruns")
+            st.table({"fragment": [next(iter(r["phases"])) for r in fragments],
+                      "ms": [r["total_ms"] for r in fragments]})
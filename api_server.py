@@ -0,0 +1,239 @@
+"""Headless JSON API over the same corpus, filters and drills as QuranApp.py.
+
+    python api_server.py --port 8502
+
+Endpoints (filters are ``{"juzz": [...], "quarter": [...], "surah": [...],
+"ruku": [[juzz, first, last], ...], "ayah": [[surah, first, last], ...]}``,
+every key optional)::
+
+    GET  /meta                            corpus metadata, drills and modes
+    POST /count     {filters}             number of matching ayahs
+    POST /generate  {filters, "mode": "study"|"test", "drills": [...]?, "seed": int?}
+    POST /reveal    {"code": ..., "question": i, "count": n?}
+
+``/generate`` returns the prompts and a quiz code but no answers; ``/reveal``
+rebuilds the set from the code, which records the drills too, so the server
+keeps no per-client state.
+The corpus, filter indexes and question sets are the process-wide caches
+the Streamlit app uses.
+"""
+import argparse
+import json
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from corpus import load_corpus
+from drills import LABELS, QUESTION_TYPE_ORDER, STUDY_MODE, TEST_MODE
+from filters import cached_selection, check_signature, filter_signature
+from quiz import MAX_SEED, cached_questions, decode_quiz_code, encode_quiz_code, new_seed
+from similar import neighbor_table
+
+MODE_NAMES = {"study": STUDY_MODE, "test": TEST_MODE, STUDY_MODE: STUDY_MODE, TEST_MODE: TEST_MODE}
+MAX_BODY = 64 * 1024
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=HTTPStatus.BAD_REQUEST):
+        super().__init__(message)
+        self.status = status
+
+
+def _natural(value):
+    # JSON true/false arrive as bool, a subclass of int
+    return isinstance(value, int) and not isinstance(value, bool) and value >= 0
+
+
+def _ints(body, key):
+    values = body.get(key, [])
+    if not isinstance(values, list) or not all(map(_natural, values)):
+        raise ApiError(f"{key!r} must be a list of non-negative integers")
+    return values
+
+
+def _ranges(body, key):
+    values = body.get(key, [])
+    if not isinstance(values, list) or not all(
+            isinstance(r, list) and len(r) == 3 and all(map(_natural, r)) for r in values):
+        raise ApiError(f"{key!r} must be a list of [a, b, c] integer triples")
+    return values
+
+
+def signature_from(corpus, body):
+    signature = filter_signature(_ints(body, "juzz"), _ints(body, "quarter"), _ints(body, "surah"),
+                                 _ranges(body, "ruku"), _ranges(body, "ayah"))
+    try:
+        check_signature(corpus, signature)
+    except ValueError as e:
+        raise ApiError(str(e)) from e
+    return signature
+
+
+def _drills(body):
+    drills = body.get("drills")
+    if drills is None:
+        return None
+    if not isinstance(drills, list) or not all(isinstance(d, str) and d in LABELS for d in drills):
+        raise ApiError(f"'drills' must be a list drawn from {QUESTION_TYPE_ORDER}")
+    # canonical, hashable form so equal requests share one cached set
+    return tuple(key for key in QUESTION_TYPE_ORDER if key in drills)
+
+
+def _ayah(a):
+    return {"ayah_key": a["ayah_key"], "text": a["text"], "juzz": a["juzz"], "ruku": a["ruku"]}
+
+
+# - Endpoints -
+def meta(corpus, body):
+    return {
+        "surahs": [{"surah": s, "name": corpus.surah_names[s]} for s in corpus.all_surah],
+        "juzz": corpus.all_juzz,
+        "quarters": corpus.all_quarter,
+        "max_ruku": {str(j): r for j, r in corpus.max_ruku.items()},
+        "drills": [{"key": key, "label": LABELS[key]} for key in QUESTION_TYPE_ORDER],
+        "modes": ["study", "test"],
+    }
+
+
+def count(corpus, body):
+    return {"count": len(cached_selection(corpus, signature_from(corpus, body)).indices)}
+
+
+def generate(corpus, body):
+    signature = signature_from(corpus, body)
+    mode = body.get("mode", "study")
+    if not isinstance(mode, str) or mode not in MODE_NAMES:
+        raise ApiError("'mode' must be 'study' or 'test'")
+    mode = MODE_NAMES[mode]
+    seed = body.get("seed")
+    if seed is None:
+        seed = new_seed()
+    elif not _natural(seed) or seed > MAX_SEED:
+        raise ApiError(f"'seed' must be an integer from 0 to {MAX_SEED}")
+    enabled = _drills(body)
+    if not cached_selection(corpus, signature).indices:
+        raise ApiError("the filters match no ayahs")
+    questions = cached_questions(corpus, signature, mode, seed, enabled)
+    return {
+        "code": encode_quiz_code(signature, mode, seed, enabled),
+        "mode": "study" if mode == STUDY_MODE else "test",
+        "questions": [
+            {"question": i, "type": q.type, "label": LABELS[q.type], "content": q.content,
+             "answer_count": len(q.answers)}
+            for i, q in enumerate(questions)
+        ],
+    }
+
+
+def reveal(corpus, body):
+    try:
+        signature, mode, seed, enabled = decode_quiz_code(str(body.get("code", "")), corpus)
+    except ValueError as e:
+        raise ApiError(str(e)) from e
+    if not cached_selection(corpus, signature).indices:
+        raise ApiError("the quiz code matches no ayahs")
+    questions = cached_questions(corpus, signature, mode, seed, enabled)
+    i = body.get("question")
+    if not _natural(i) or i >= len(questions):
+        raise ApiError(f"'question' must be an index below {len(questions)}")
+    answers = questions[i].answers
+    n = body.get("count", len(answers))
+    if not _natural(n):
+        raise ApiError("'count' must be a non-negative integer")
+    return {"question": i, "answer_count": len(answers),
+            "answers": [_ayah(corpus.ayahs[a]) for a in answers[:n]]}
+
+
+ROUTES = {
+    ("GET", "/meta"): meta,
+    ("POST", "/count"): count,
+    ("POST", "/generate"): generate,
+    ("POST", "/reveal"): reveal,
+}
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive: clients reuse one connection
+    # headers and body leave in one segment, without waiting on Nagle/delayed ACK
+    wbufsize = -1
+    disable_nagle_algorithm = True
+    corpus_path = None
+
+    def _handle(self, method):
+        try:
+            endpoint = ROUTES.get((method, self.path.split("?", 1)[0]))
+            if endpoint is None:
+                raise ApiError("not found", HTTPStatus.NOT_FOUND)
+            body = self._body() if method == "POST" else {}
+            self._send(HTTPStatus.OK, endpoint(load_corpus(self.corpus_path), body))
+        except ApiError as e:
+            self._send(e.status, {"error": str(e)})
+        except Exception as e:
+            self.log_error("%s %s failed: %r", method, self.path, e)
+            self._send(HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "internal error"})
+
+    def _body(self):
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            raise ApiError("bad Content-Length")
+        if length < 0:
+            raise ApiError("bad Content-Length")
+        if length > MAX_BODY:
+            raise ApiError("request body too large", HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            raise ApiError("request body is not JSON")
+        if not isinstance(body, dict):
+            raise ApiError("request body must be a JSON object")
+        return body
+
+    def _send(self, status, payload):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def log_request(self, code="-", size="-"):
+        # one line per request is too much at hundreds of requests a second
+        pass
+
+
+def make_server(host="127.0.0.1", port=8502, corpus_path=None):
+    """A ``ThreadingHTTPServer`` with the corpus already loaded; call ``serve_forever()``."""
+    corpus = load_corpus(corpus_path)
+    # the similar-ayah drill needs it; built now when master_quran.sim is missing
+    neighbor_table(corpus)
+    handler = type("Handler", (ApiHandler,), {"corpus_path": corpus_path})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve question generation as JSON over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8502)
+    parser.add_argument("--corpus", help="corpus file (default: master_quran.bin/.json next to this script)")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.corpus)
+    print(f"Serving on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
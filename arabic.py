@@ -0,0 +1,63 @@
+"""Normalization of Arabic text for matching.
+
+``normalize`` folds the Uthmani script of ``master_quran.json`` and what a
+user types on an ordinary keyboard to the same bare letters: tashkeel and
+Quranic annotation marks (including the superscript alef and the small
+waw/ya) are dropped, hamza seats and alef forms are unified, and runs of
+whitespace collapse to one space.
+
+The Uthmani script joins the vocative يا to the word it calls (يَٰٓأَيُّهَا,
+يَٰبَنِىٓ), where everybody types two words; ``normalize`` and ``words``
+both split it off, so word counts agree with typed text.
+"""
+import re
+
+# - Marks dropped outright -
+_MARKS = [
+    *range(0x0610, 0x061B),  # honorifics and small high signs
+    *range(0x064B, 0x0660),  # tashkeel: tanween, harakat, shadda, sukun, maddah, hamza marks
+    0x0640,                  # tatweel
+    0x0670,                  # superscript (dagger) alef
+    *range(0x06D6, 0x06EE),  # Quranic annotation: pause marks, small letters, rub el hizb
+    *range(0x08D3, 0x0900),  # extended Quranic marks
+]
+
+# - Letter variants folded to one form -
+_FOLD = {
+    "ا": "أإآٱٲٳٵ",
+    # a lone hamza mostly stands where typed text seats it on ya (إسرٰءيل, إسرائيل)
+    "ي": "ىیئء",
+    "و": "ؤ",
+    "ه": "ة",
+    "ك": "ک",
+}
+
+# one regex pass and a few str.replace calls beat str.translate, which
+# looks every non-ASCII character up in a dict
+_MARK_CLASS = "[" + "".join(map(chr, _MARKS)) + "]"
+_MARKS_RE = re.compile(_MARK_CLASS + "+")
+_REPLACE = [(v, base) for base, variants in _FOLD.items() for v in variants]
+# ءا is the madda alef آ (ءَامَنُوا۟): folded after the alef forms, before the lone hamza
+_REPLACE.insert(len(_FOLD["ا"]), ("ءا", "ا"))
+
+# a word-initial ya carrying the superscript alef, with its marks: the vocative يا
+_VOCATIVE_RE = re.compile(rf"(?<!\S)\u064a{_MARK_CLASS}*\u0670{_MARK_CLASS}*")
+
+
+def normalize(text):
+    """``text`` with marks stripped and letter variants unified, single-spaced."""
+    text = _VOCATIVE_RE.sub("يا ", text)
+    text = _MARKS_RE.sub("", text)
+    for variant, base in _REPLACE:
+        text = text.replace(variant, base)
+    return " ".join(text.split())
+
+
+def words(text):
+    """The words of ``text``, without the pause marks that stand alone between them.
+
+    A joined vocative counts as two words (يَٰٓ and أَيُّهَا);
+    ``normalize(text).split()`` gives the same words, normalized.
+    """
+    # a word normalizes to nothing exactly when it is all marks
+    return [w for w in _VOCATIVE_RE.sub("\\g<0> ", text).split() if not _MARKS_RE.fullmatch(w)]
@@ -0,0 +1,178 @@
+"""Generate many independent question sets for one filter selection.
+
+Example: 120 Test Mode worksheets for juzz 1, ruku 3-5 of juzz 2 and
+Al-Baqarah 10-20, written as printable HTML::
+
+    python batch.py --juzz 1 --ruku 2:3-5 --ayah 2:10-20 --mode test \\
+        --count 120 --format html -o worksheets.html
+
+The corpus, the selection and its indexes are built once and shared by the
+whole batch; ``--workers`` spreads very large batches over a process pool.
+"""
+import argparse
+import html
+import json
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from corpus import load_corpus
+from drills import LABELS, STUDY_MODE, TEST_MODE, generate_questions
+from filters import cached_selection, check_signature, filter_signature
+from quiz import encode_quiz_code, new_seed
+
+
+def question_set_seed(seed, n):
+    """Seed of set ``n`` of a batch: derived from the batch seed, or fresh without one."""
+    return random.Random(f"{seed}:{n}").getrandbits(32) if seed is not None else new_seed()
+
+
+def generate_batch(corpus, signature, mode, count, seed=None, enabled=None, start=0):
+    """Yield ``(n, quiz_code, questions)`` for sets ``start .. start + count - 1``.
+
+    Each set is generated from its own seed, so its quiz code rebuilds exactly
+    that set in the app.
+    """
+    selection = cached_selection(corpus, signature)
+    for n in range(start, start + count):
+        set_seed = question_set_seed(seed, n)
+        questions = generate_questions(corpus, selection, mode, enabled, random.Random(set_seed))
+        yield n, encode_quiz_code(signature, mode, set_seed, enabled), questions
+
+
+# - Process pool: each worker loads the corpus and selection once -
+_worker = {}
+
+
+def _init_worker(corpus_path, signature, mode, seed, enabled):
+    corpus = load_corpus(corpus_path)
+    cached_selection(corpus, signature)
+    _worker.update(corpus=corpus, signature=signature, mode=mode, seed=seed, enabled=enabled)
+
+
+def _worker_chunk(bounds):
+    start, stop = bounds
+    w = _worker
+    return list(generate_batch(w["corpus"], w["signature"], w["mode"], stop - start,
+                               w["seed"], w["enabled"], start))
+
+
+def generate_batch_parallel(corpus_path, signature, mode, count, workers, seed=None, enabled=None,
+                            chunk_size=64):
+    """Like ``generate_batch`` over a process pool; sets are yielded in order."""
+    chunks = [(i, min(i + chunk_size, count)) for i in range(0, count, chunk_size)]
+    with ProcessPoolExecutor(workers, initializer=_init_worker,
+                             initargs=(corpus_path, signature, mode, seed, enabled)) as pool:
+        for result in pool.map(_worker_chunk, chunks):
+            yield from result
+
+
+# - Output -
+def question_to_dict(corpus, question, answer_text=False):
+    answers = (corpus.ayahs[i] for i in question.answers)
+    return {
+        "type": question.type,
+        "label": LABELS[question.type],
+        "content": question.content,
+        "answers": [
+            {"ayah_key": a["ayah_key"], "text": a["text"]} if answer_text else a["ayah_key"]
+            for a in answers
+        ],
+    }
+
+
+def write_jsonl(corpus, sets, out, answer_key=False):
+    for n, code, questions in sets:
+        record = {"set": n + 1, "code": code,
+                  "questions": [question_to_dict(corpus, q, answer_key) for q in questions]}
+        out.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+HTML_HEAD = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Quran Mastery Trainer – Worksheets</title>
+<style>
+body { font-family: sans-serif; margin: 2em; }
+section { page-break-after: always; }
+h2 { border-bottom: 1px solid #888; }
+.answers div[dir="rtl"] { font-size: 1.3em; line-height: 1.8; text-align: center; }
+.answers { margin-top: 1em; color: #333; }
+</style></head><body>
+"""
+
+
+def write_html(corpus, sets, out, answer_key=False):
+    out.write(HTML_HEAD)
+    for n, code, questions in sets:
+        out.write(f"<section><h2>Worksheet {n + 1} <small>(quiz code {code})</small></h2><ol>\n")
+        for q in questions:
+            out.write(f"<li><b>{html.escape(LABELS[q.type])}</b><br>{html.escape(q.content)}")
+            if answer_key:
+                out.write("<div class='answers'>")
+                for a in (corpus.ayahs[i] for i in q.answers):
+                    out.write(f"<div dir='rtl'>{html.escape(a['text'])} - ({a['ayah_key']})</div>")
+                out.write("</div>")
+            out.write("</li>\n")
+        out.write("</ol></section>\n")
+    out.write("</body></html>\n")
+
+
+def _parse_range(text):
+    # "J:S-E" / "S:A-B" -> (J, S, E)
+    head, _, span = text.partition(":")
+    first, _, last = span.partition("-")
+    return int(head), int(first), int(last or first)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate question sets for a whole class in one pass.")
+    parser.add_argument("--juzz", type=int, nargs="*", default=[])
+    parser.add_argument("--quarter", type=int, nargs="*", default=[])
+    parser.add_argument("--surah", type=int, nargs="*", default=[])
+    parser.add_argument("--ruku", type=_parse_range, nargs="*", default=[], metavar="JUZZ:START-END")
+    parser.add_argument("--ayah", type=_parse_range, nargs="*", default=[], metavar="SURAH:START-END")
+    parser.add_argument("--mode", choices=["study", "test"], default="test")
+    parser.add_argument("--count", type=int, default=1, help="number of question sets")
+    parser.add_argument("--drills", nargs="*", choices=list(LABELS), help="drill types to include (default: all)")
+    parser.add_argument("--seed", help="make the batch reproducible")
+    parser.add_argument("--workers", type=int, default=0, help="process pool size (0: generate in-process)")
+    parser.add_argument("--format", choices=["jsonl", "html"], default="jsonl")
+    parser.add_argument("--answer-key", action="store_true",
+                        help="include answer texts (JSONL lists only ayah keys otherwise; HTML omits answers)")
+    parser.add_argument("--corpus", help="corpus file (default: master_quran.bin/.json next to this script)")
+    parser.add_argument("-o", "--output", help="output file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    corpus = load_corpus(args.corpus)
+    signature = filter_signature(args.juzz, args.quarter, args.surah, args.ruku, args.ayah)
+    try:
+        check_signature(corpus, signature)
+    except ValueError as e:
+        parser.error(str(e))
+    selection = cached_selection(corpus, signature)
+    if not selection.ayahs:
+        parser.error("the filters match no ayahs")
+    mode = STUDY_MODE if args.mode == "study" else TEST_MODE
+
+    started = time.perf_counter()
+    if args.workers > 1:
+        sets = generate_batch_parallel(args.corpus, signature, mode, args.count, args.workers,
+                                       args.seed, args.drills)
+    else:
+        sets = generate_batch(corpus, signature, mode, args.count, args.seed, args.drills)
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        if args.format == "html":
+            write_html(corpus, sets, out, args.answer_key)
+        else:
+            write_jsonl(corpus, sets, out, args.answer_key)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"{args.count} question sets over {len(selection.ayahs)} ayahs "
+          f"in {time.perf_counter() - started:.3f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
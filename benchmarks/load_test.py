@@ -0,0 +1,194 @@
+"""Drive QuranApp.py with many concurrent headless sessions.
+
+Every session is a ``streamlit.testing.v1.AppTest`` on its own thread,
+all released at once, the way a class opens the app together. Each one
+opens the app, picks a juzz, adds a ruku range, picks a mode, generates
+and then clicks Reveal Next/Reveal All. Everything runs offline in one
+process, as the Streamlit server would run the sessions::
+
+    python benchmarks/load_test.py --sessions 60 --reveals 20 --synthetic -o load.json
+
+``--synthetic`` runs a copy of the app against the 6,236-ayah synthetic
+corpus instead of the shipped one. AppTest always reruns the whole
+script, so Reveal latencies are full-rerun figures, an upper bound for
+the fragment reruns a browser triggers.
+
+AppTest keeps process-global runtime state, so reruns take turns on one
+lock. That is also how CPU-bound reruns behave under the GIL in a real
+server. ``latency`` therefore includes the wait for the other sessions,
+and ``service`` is the rerun alone.
+"""
+import argparse
+import json
+import os
+import pickle
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+from synth_corpus import make_corpus, shipped_texts  # noqa: E402
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+# AppTest is not safe to run from several threads at once
+_run_lock = threading.Lock()
+
+
+def rss_bytes():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * PAGE_SIZE
+
+
+def percentiles(values):
+    if not values:
+        return {}
+    q = statistics.quantiles(values, n=100, method="inclusive") if len(values) > 1 else values * 99
+    return {"count": len(values), "p50_ms": round(q[49], 2), "p95_ms": round(q[94], 2),
+            "p99_ms": round(q[98], 2), "max_ms": round(max(values), 2)}
+
+
+def synthetic_app(tmp):
+    """Copy the app next to a synthetic full-size master_quran.json; return the script path."""
+    for path in ROOT.glob("*.py"):
+        shutil.copy(path, tmp)
+    if (ROOT / ".streamlit").is_dir():
+        shutil.copytree(ROOT / ".streamlit", Path(tmp) / ".streamlit")
+    with open(Path(tmp) / "master_quran.json", "w", encoding="utf-8") as f:
+        json.dump(make_corpus(shipped_texts()), f, ensure_ascii=False)
+    return str(Path(tmp) / "QuranApp.py")
+
+
+class Session:
+    """One simulated user; ``timings`` holds (action, latency ms, service ms) per rerun."""
+
+    def __init__(self, script, seed, reveals, timeout):
+        self.script = script
+        self.rng = random.Random(seed)
+        self.reveals = reveals
+        self.timeout = timeout
+        self.timings = []
+        self.at = None
+        self.error = None
+
+    def _rerun(self, action, widget=None):
+        queued = time.perf_counter()
+        with _run_lock:
+            started = time.perf_counter()
+            (widget.run() if widget is not None else self.at.run())
+            done = time.perf_counter()
+        self.timings.append((action, (done - queued) * 1000, (done - started) * 1000))
+        if self.at.exception:
+            raise RuntimeError(f"{action}: {self.at.exception[0].message}")
+
+    def _button(self, label):
+        return [b for b in self.at.button if b.label == label]
+
+    def run(self, start):
+        try:
+            start.wait()
+            self.at = AppTest.from_file(self.script, default_timeout=self.timeout)
+            self._rerun("open")
+            juzz = self.at.sidebar.multiselect[0]
+            self._rerun("filter", juzz.select(self.rng.choice(juzz.options)))
+
+            rjuzz = self.at.sidebar.selectbox(key="rjuzz2")
+            rjuzz.set_value(self.rng.choice(rjuzz.options))
+            first = self.rng.randint(1, 3)
+            self.at.sidebar.number_input(key="rstart2").set_value(first)
+            self.at.sidebar.number_input(key="rend2").set_value(first + self.rng.randint(0, 2))
+            self._rerun("add_ruku", self.at.sidebar.button(key="add_ruku").click())
+
+            mode = self.at.sidebar.radio(key="mode")
+            self._rerun("mode", mode.set_value(self.rng.choice(mode.options)))
+            self._rerun("generate", self._button("Generate Challenge Questions")[0].click())
+
+            for _ in range(self.reveals):
+                label = "Reveal All" if self.rng.random() < 0.1 else "Reveal Next"
+                buttons = self._button(label)
+                self._rerun("reveal", self.rng.choice(buttons).click())
+        except Exception as e:  # report, don't abort the other sessions
+            self.error = repr(e)
+
+    def session_state_bytes(self):
+        try:
+            state = self.at.session_state.to_dict()
+        except Exception:
+            return None
+        size = 0
+        for value in state.values():
+            try:
+                size += len(pickle.dumps(value))
+            except Exception:  # live objects such as a pending prefetch
+                pass
+        return size
+
+
+def run_load(script, sessions, reveals, timeout, seed=0):
+    rss_before = rss_bytes()
+    start = threading.Barrier(sessions)
+    users = [Session(script, seed + n, reveals, timeout) for n in range(sessions)]
+    wall = time.perf_counter()
+    with ThreadPoolExecutor(sessions) as pool:
+        list(pool.map(lambda s: s.run(start), users))
+    wall = time.perf_counter() - wall
+    rss_after = rss_bytes()  # every AppTest is still alive here
+
+    by_action = {}
+    for s in users:
+        for action, ms, _ in s.timings:
+            by_action.setdefault(action, []).append(ms)
+    state_sizes = [b for b in (s.session_state_bytes() for s in users) if b is not None]
+    return {
+        "sessions": sessions,
+        "reveals_per_session": reveals,
+        "wall_s": round(wall, 2),
+        "reruns": sum(len(s.timings) for s in users),
+        "errors": [s.error for s in users if s.error],
+        "latency": {"all": percentiles([ms for s in users for _, ms, _ in s.timings]),
+                    **{action: percentiles(v) for action, v in by_action.items()}},
+        "service": percentiles([ms for s in users for _, _, ms in s.timings]),
+        "memory": {
+            "rss_before_mb": round(rss_before / 2**20, 1),
+            "rss_after_mb": round(rss_after / 2**20, 1),
+            "rss_per_session_kb": round((rss_after - rss_before) / sessions / 1024, 1),
+            "session_state_kb_p50": round(statistics.median(state_sizes) / 1024, 1) if state_sizes else None,
+            "session_state_kb_max": round(max(state_sizes) / 1024, 1) if state_sizes else None,
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent-session load test for QuranApp.py.")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--reveals", type=int, default=20, help="reveal clicks per session")
+    parser.add_argument("--synthetic", action="store_true", help="use a synthetic 6,236-ayah corpus")
+    parser.add_argument("--timeout", type=float, default=120, help="seconds allowed per rerun")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="write the JSON report here (default: stdout)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        script = synthetic_app(tmp) if args.synthetic else str(ROOT / "QuranApp.py")
+        report = run_load(script, args.sessions, args.reveals, args.timeout, args.seed)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
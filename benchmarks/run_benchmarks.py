@@ -0,0 +1,264 @@
+"""Time corpus loading, filtering, ayah search, the similar-ayah and word
+tables, every drill, typed-answer grading and answer rendering.
+
+Runs against a synthetic full-size corpus (see ``synth_corpus.py``) unless
+``--corpus`` is given, and writes the results as JSON::
+
+    python benchmarks/run_benchmarks.py -o bench.json
+    python benchmarks/run_benchmarks.py --compare bench.json   # ratios against a baseline
+
+Each result is ``{"name", "params", "runs", "median_us", "min_us"}``.
+"""
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from arabic import normalize  # noqa: E402
+from corpus import Corpus, _read_ayahs, load_corpus  # noqa: E402
+from corpus_bin import write_corpus_bin  # noqa: E402
+from drills import DRILLS, MODES, generate_questions  # noqa: E402
+from filters import FilterEngine, Selection, filter_engine, filter_signature  # noqa: E402
+from grading import grade, normalized_corpus  # noqa: E402
+from rendering import ANSWER_PAGE_SIZE, answers_html, ayah_html  # noqa: E402
+from search import SearchIndex, search_index  # noqa: E402
+from similar import NeighborTable, neighbor_table  # noqa: E402
+from synth_corpus import make_corpus, shipped_texts  # noqa: E402
+from tokens import WordTable, word_table  # noqa: E402
+
+RANGE_COUNTS = (0, 10, 100)
+SEARCH_WORDS = (1, 2, 4)
+
+
+def timed(fn, min_runs=5, min_seconds=0.2):
+    """Per-call times in microseconds: at least ``min_runs`` calls and ``min_seconds``."""
+    times = []
+    started = time.perf_counter()
+    while len(times) < min_runs or time.perf_counter() - started < min_seconds:
+        t = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t) * 1e6)
+    return times
+
+
+def result(name, params, times):
+    return {"name": name, "params": params, "runs": len(times),
+            "median_us": round(statistics.median(times), 2), "min_us": round(min(times), 2)}
+
+
+def selection_sizes(corpus):
+    """Named filter signatures from one ruku up to the whole corpus."""
+    j = corpus.all_juzz[0]
+    return {
+        "ruku": filter_signature(ruku_ranges=[(j, 1, 1)]),
+        "juzz": filter_signature(juzz_sel=[j]),
+        "5_juzz": filter_signature(juzz_sel=corpus.all_juzz[:5]),
+        "all": filter_signature(juzz_sel=corpus.all_juzz),
+    }
+
+
+def random_ranges(corpus, n, rng):
+    rukus, ayahs = [], []
+    for _ in range(n):
+        j = rng.choice(corpus.all_juzz)
+        first = rng.randint(1, corpus.max_ruku[j])
+        rukus.append((j, first, rng.randint(first, corpus.max_ruku[j])))
+        a = corpus.ayahs[rng.randrange(len(corpus.ayahs))]
+        ayahs.append((a["surah"], a["ayah"], a["ayah"] + rng.randint(0, 20)))
+    return rukus, ayahs
+
+
+def bench_load(json_path, bin_path):
+    out = []
+    for fmt, path in (("json", json_path), ("bin", bin_path)):
+        out.append(result("corpus_load", {"format": fmt},
+                          timed(lambda: Corpus(_read_ayahs(path), 0), min_runs=3)))
+    return out
+
+
+def bench_filters(corpus, rng):
+    out = [result("filter_engine_build", {}, timed(lambda: FilterEngine(corpus), min_runs=3))]
+    engine = filter_engine(corpus)
+    for n in RANGE_COUNTS:
+        rukus, ayahs = random_ranges(corpus, n, rng)
+        sig = filter_signature([corpus.all_juzz[0]], [], [], rukus, ayahs)
+        out.append(result("filter_select", {"ranges": n}, timed(lambda: engine.select(*sig))))
+        indices = engine.select(*sig)
+        out.append(result("selection_build", {"ranges": n, "ayahs": len(indices)},
+                          timed(lambda: Selection(corpus, indices))))
+    return out
+
+
+def bench_search(corpus, rng):
+    out = [result("search_index_build", {}, timed(lambda: SearchIndex(corpus), min_runs=3))]
+    index = search_index(corpus)
+    for n in SEARCH_WORDS:
+        # runs of n words from random ayahs: common words hit thousands of ayahs
+        queries = []
+        while len(queries) < 20:
+            words = corpus.ayahs[rng.randrange(len(corpus.ayahs))]["text"].split()
+            if len(words) >= n:
+                start = rng.randrange(len(words) - n + 1)
+                queries.append(" ".join(words[start:start + n]))
+
+        def search():
+            for query in queries:
+                index.find(query)
+        times = [t / len(queries) for t in timed(search)]
+        out.append(result("search_query", {"words": n}, times))
+    return out
+
+
+def bench_similar(corpus):
+    # a few seconds per build on the full corpus: once is enough
+    out = [result("similar_table_build", {}, timed(lambda: NeighborTable.build(corpus.ayahs), min_runs=1))]
+    neighbor_table(corpus)  # so the similar-ayah drill is timed without the build
+    return out
+
+
+def bench_words(corpus):
+    out = [result("word_table_build", {}, timed(lambda: WordTable(corpus), min_runs=3))]
+    word_table(corpus)  # so the word drills are timed without the build
+    return out
+
+
+def bench_drills(corpus, selections, rng):
+    out = []
+    for size, selection in selections.items():
+        for mode in MODES:
+            for key, drill in DRILLS.items():
+                times = timed(lambda: drill.generate(corpus, selection, mode, rng))
+                out.append(result("drill", {"drill": key, "mode": mode, "selection": size,
+                                            "ayahs": len(selection.indices)}, times))
+    return out
+
+
+def _typo(text, rng):
+    # the ayah as typed, without tashkeel, with one word wrong
+    typed = normalize(text).split()
+    typed[rng.randrange(len(typed))] = "خطا"
+    return " ".join(typed)
+
+
+def bench_grading(corpus, rng):
+    out = [result("grading_corpus_build", {}, timed(lambda: normalized_corpus.__wrapped__(corpus), min_runs=3))]
+    keys = normalized_corpus(corpus)
+    longest = max(range(len(keys)), key=lambda i: len(keys[i]))
+    typed = _typo(corpus.ayahs[longest]["text"], rng)
+    out.append(result("grade_typed", {"ayahs": 1, "words": len(keys[longest])},
+                      timed(lambda: grade(corpus, longest, typed))))
+    # a full Test Mode answer set
+    picks = rng.sample(range(len(keys)), 20)
+    answers = [(i, _typo(corpus.ayahs[i]["text"], rng)) for i in picks]
+    out.append(result("grade_typed", {"ayahs": 20},
+                      timed(lambda: [grade(corpus, i, text) for i, text in answers])))
+    return out
+
+
+def bench_rendering(corpus, selections, rng):
+    out = []
+    for size, selection in selections.items():
+        for mode in MODES:
+            questions = generate_questions(corpus, selection, mode, rng=rng)
+            answers = sum(len(q.answers) for q in questions)
+            for include_info in (False, True):
+                def render():
+                    for q in questions:
+                        for i in q.answers:
+                            ayah_html(corpus.ayahs[i], include_info)
+                out.append(result("render_answers", {"mode": mode, "selection": size, "answers": answers,
+                                                     "include_info": include_info}, timed(render)))
+
+                # what a rerun sends: one cached HTML block per question page
+                def render_pages():
+                    for q in questions:
+                        answers_html(corpus, q.answers[-ANSWER_PAGE_SIZE:], include_info)
+                out.append(result("render_answer_pages", {"mode": mode, "selection": size,
+                                                          "include_info": include_info}, timed(render_pages)))
+    return out
+
+
+def run(corpus_path=None):
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        if corpus_path is None:
+            ayahs = make_corpus(shipped_texts())
+            corpus_path = Path(tmp) / "synthetic.json"
+            with open(corpus_path, "w", encoding="utf-8") as f:
+                json.dump(ayahs, f, ensure_ascii=False)
+        else:
+            corpus_path = Path(corpus_path)
+            ayahs = _read_ayahs(corpus_path)
+        bin_path = Path(tmp) / "corpus.bin"
+        write_corpus_bin(ayahs, bin_path)
+
+        results = bench_load(corpus_path, bin_path)
+        corpus = load_corpus(corpus_path)
+        results += bench_filters(corpus, rng)
+        results += bench_search(corpus, rng)
+        results += bench_similar(corpus)
+        results += bench_words(corpus)
+        engine = filter_engine(corpus)
+        selections = {size: Selection(corpus, engine.select(*sig))
+                      for size, sig in selection_sizes(corpus).items()}
+        results += bench_drills(corpus, selections, rng)
+        results += bench_grading(corpus, rng)
+        results += bench_rendering(corpus, selections, rng)
+
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "ayahs": len(corpus.ayahs),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+
+def _key(r):
+    return r["name"], json.dumps(r["params"], sort_keys=True)
+
+
+def compare(report, baseline):
+    """Print the median of every benchmark next to the baseline's, slowest ratio first."""
+    base = {_key(r): r for r in baseline["results"]}
+    rows = []
+    for r in report["results"]:
+        b = base.get(_key(r))
+        if b and b["median_us"]:
+            rows.append((r["median_us"] / b["median_us"], r, b))
+    for ratio, r, b in sorted(rows, key=lambda row: -row[0]):
+        print(f"{ratio:6.2f}x  {b['median_us']:>11.1f} -> {r['median_us']:>11.1f} us  "
+              f"{r['name']} {json.dumps(r['params'], sort_keys=True)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark filtering, drills and rendering.")
+    parser.add_argument("--corpus", help="corpus .json to use instead of the synthetic full-size one")
+    parser.add_argument("-o", "--output", help="write the JSON report here (default: stdout)")
+    parser.add_argument("--compare", help="baseline report to compare against")
+    args = parser.parse_args()
+
+    report = run(args.corpus)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(report, json.load(f))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    elif not args.compare:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
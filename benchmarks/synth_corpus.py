@@ -0,0 +1,80 @@
+"""Synthetic full-size corpus in the master_quran.json schema.
+
+The shipped master_quran.json covers 141 ayahs; benchmarks need all
+6,236. Surahs have their real ayah counts; juzz, quarters (4 per juzz)
+and rukus (558, numbered within their juzz) are spread evenly over the
+ayahs, and texts are recycled from the shipped corpus.
+
+    python benchmarks/synth_corpus.py full_quran.json [--bin full_quran.bin]
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from corpus_bin import write_corpus_bin  # noqa: E402
+
+SURAH_AYAHS = (
+    7, 286, 200, 176, 120, 165, 206, 75, 129, 109, 123, 111, 43, 52, 99, 128, 111, 110, 98, 135,
+    112, 78, 118, 64, 77, 227, 93, 88, 69, 60, 34, 30, 73, 54, 45, 83, 182, 88, 75, 85,
+    54, 53, 89, 59, 37, 35, 38, 29, 18, 45, 60, 49, 62, 55, 78, 96, 29, 22, 24, 13,
+    14, 11, 11, 18, 12, 12, 30, 52, 52, 44, 28, 28, 20, 56, 40, 31, 50, 40, 46, 42,
+    29, 19, 36, 25, 22, 17, 19, 26, 30, 20, 15, 21, 11, 8, 8, 19, 5, 8, 8, 11,
+    11, 8, 3, 9, 5, 4, 7, 3, 6, 3, 5, 4, 5, 6,
+)
+JUZZ = 30
+QUARTERS_PER_JUZZ = 4
+RUKUS = 558
+
+
+def make_corpus(texts):
+    """All ayahs as master_quran.json dicts; ``texts`` are cycled for the ayah texts."""
+    total = sum(SURAH_AYAHS)
+    ayahs = []
+    first_ruku = {}  # juzz -> global ordinal of its first ruku
+    i = 0
+    for surah, count in enumerate(SURAH_AYAHS, start=1):
+        for ayah in range(1, count + 1):
+            juzz = i * JUZZ // total + 1
+            quarter = i * JUZZ * QUARTERS_PER_JUZZ // total % QUARTERS_PER_JUZZ + 1
+            ruku = i * RUKUS // total
+            first_ruku.setdefault(juzz, ruku)
+            ayahs.append({
+                "surah": surah,
+                "surah_name": f"Surah {surah}",
+                "ayah": ayah,
+                "text": texts[i % len(texts)],
+                "juzz": juzz,
+                "quarter": str(quarter),
+                "ruku": ruku - first_ruku[juzz] + 1,
+                "page": None,
+                "ayah_key": f"{surah}:{ayah}",
+            })
+            i += 1
+    return ayahs
+
+
+def shipped_texts():
+    with open(ROOT / "master_quran.json", "r", encoding="utf-8") as f:
+        return [a["text"] for a in json.load(f)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic 6,236-ayah corpus.")
+    parser.add_argument("output", help="JSON file to write")
+    parser.add_argument("--bin", help="also write the mapped .bin form here")
+    args = parser.parse_args()
+
+    ayahs = make_corpus(shipped_texts())
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(ayahs, f, ensure_ascii=False, indent=2)
+    if args.bin:
+        write_corpus_bin(ayahs, args.bin)
+    print(f"Wrote {len(ayahs)} ayahs to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import json
+import os
+import threading
+from array import array
+from bisect import bisect_right
+from pathlib import Path
+
+from corpus_bin import MappedAyahs
+
+CORPUS_PATH     = Path(__file__).parent / "master_quran.json"
+# compiled by corpus_bin.py; used instead of the JSON while it is up to date
+CORPUS_BIN_PATH = Path(__file__).parent / "master_quran.bin"
+
+
+# - Position index: ayah_key -> position in a list of ayahs -
+def build_position_index(ayahs):
+    return {a["ayah_key"]: i for i, a in enumerate(ayahs)}
+
+
+# - Spans: ordered (juzz, <field>, start_idx, end_idx) runs, end exclusive -
+def build_spans(ayahs, field):
+    spans = []
+    for i, a in enumerate(ayahs):
+        if spans and spans[-1][0] == a["juzz"] and spans[-1][1] == a[field]:
+            spans[-1][3] = i + 1
+        else:
+            spans.append([a["juzz"], a[field], i, i + 1])
+    return [tuple(span) for span in spans]
+
+
+def build_ruku_spans(ayahs):
+    return build_spans(ayahs, "ruku")
+
+
+class Corpus:
+    """The parsed ayah list plus the metadata tables derived from it.
+
+    Instances are shared by every session in the process and must be
+    treated as read-only.
+    """
+
+    def __init__(self, ayahs, mtime):
+        self.ayahs = ayahs
+        self.mtime = mtime
+
+        # - Metadata for filters -
+        self.surah_names = {a["surah"]: a["surah_name"] for a in ayahs}
+        self.all_surah   = sorted({a["surah"] for a in ayahs})
+        self.all_juzz    = sorted({a["juzz"]  for a in ayahs})
+        self.all_quarter = sorted({a["quarter"] for a in ayahs})
+
+        # - Indexes -
+        self.positions  = build_position_index(ayahs)
+        self.ruku_spans = build_ruku_spans(ayahs)
+        # (juzz, ruku) -> global ruku ordinal, so "next ruku" crosses juzz boundaries
+        self.ruku_ordinal = {(j, r): n for n, (j, r, _, _) in enumerate(self.ruku_spans)}
+        self.max_ruku = {}
+        for j, r, _, _ in self.ruku_spans:
+            self.max_ruku[j] = max(r, self.max_ruku.get(j, r))
+
+        # - Boundary tables -
+        # (juzz, quarter, first, end) in reading order; quarter_starts is
+        # binary-searchable, so the quarter holding any ayah is one bisect
+        self.quarter_spans  = build_spans(ayahs, "quarter")
+        self.quarter_starts = array("H", (start for _, _, start, _ in self.quarter_spans))
+
+    def quarter_at(self, i):
+        """Ordinal in ``quarter_spans`` of the quarter holding corpus index ``i``."""
+        return bisect_right(self.quarter_starts, i) - 1
+
+
+_lock = threading.Lock()
+_loaded = {}  # path -> Corpus
+
+
+def default_corpus_path():
+    try:
+        if os.stat(CORPUS_BIN_PATH).st_mtime_ns >= os.stat(CORPUS_PATH).st_mtime_ns:
+            return CORPUS_BIN_PATH
+    except FileNotFoundError:
+        pass
+    return CORPUS_PATH
+
+
+def _read_ayahs(path):
+    if path.suffix == ".bin":
+        return MappedAyahs(path)
+    with open(path, "r", encoding="utf-8") as f:
+        ayahs = json.load(f)
+    # master_quran.json stores the quarter as a string; everything else uses ints
+    for a in ayahs:
+        a["quarter"] = int(a["quarter"])
+    return ayahs
+
+
+def load_corpus(path=None):
+    """Return the corpus at ``path``, parsing it only when its mtime changes.
+
+    Without a path, the compiled ``master_quran.bin`` is memory-mapped when
+    it is at least as new as ``master_quran.json``; otherwise the JSON is
+    parsed.
+    """
+    path = Path(path) if path is not None else default_corpus_path()
+    mtime = os.stat(path).st_mtime_ns
+    corpus = _loaded.get(path)
+    if corpus is not None and corpus.mtime == mtime:
+        return corpus
+    with _lock:
+        corpus = _loaded.get(path)
+        if corpus is None or corpus.mtime != mtime:
+            corpus = Corpus(_read_ayahs(path), mtime)
+            _loaded[path] = corpus
+    return corpus
@@ -0,0 +1,186 @@
+"""Columnar, memory-mappable form of master_quran.json.
+
+Layout (little-endian, every section 4-byte aligned)::
+
+    header        "QMT1", ayah count n, surah name slots m, text blob size
+    int columns   surah, ayah, juzz, quarter, ruku, page   -> uint16[n] each
+    text offsets  uint32[n + 1]
+    name offsets  uint32[m + 1]      (indexed by surah number)
+    text blob     UTF-8
+    name blob     UTF-8
+
+A missing ``page`` is stored as 0. Every Streamlit worker process maps the
+same file, so the pages are shared instead of each process holding its own
+copy of the parsed JSON.
+
+Convert with ``python corpus_bin.py [master_quran.json] [master_quran.bin]``.
+"""
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections.abc import Mapping, Sequence
+from pathlib import Path
+
+MAGIC = b"QMT1"
+HEADER = struct.Struct("<4sIII")
+INT_COLUMNS = ("surah", "ayah", "juzz", "quarter", "ruku", "page")
+FIELDS = ("surah", "surah_name", "ayah", "text", "juzz", "quarter", "ruku", "page", "ayah_key")
+
+
+def _pad(size):
+    return -size % 4
+
+
+def _le(arr):
+    if sys.byteorder != "little":
+        arr = array(arr.typecode, arr)
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def write_corpus_bin(ayahs, path):
+    """Write ``ayahs`` (dicts in master_quran.json form) to ``path``."""
+    n = len(ayahs)
+    columns = {name: array("H") for name in INT_COLUMNS}
+    text_offsets = array("I", [0])
+    texts = bytearray()
+    for a in ayahs:
+        for name in INT_COLUMNS:
+            columns[name].append(int(a[name] or 0))
+        texts += a["text"].encode("utf-8")
+        text_offsets.append(len(texts))
+
+    names = {a["surah"]: a["surah_name"] for a in ayahs}
+    slots = max(names, default=0) + 1
+    name_offsets = array("I", [0])
+    name_blob = bytearray()
+    for surah in range(slots):
+        name_blob += names.get(surah, "").encode("utf-8")
+        name_offsets.append(len(name_blob))
+
+    parts = [HEADER.pack(MAGIC, n, slots, len(texts))]
+    for name in INT_COLUMNS:
+        data = _le(columns[name])
+        parts += [data, b"\0" * _pad(len(data))]
+    parts += [_le(text_offsets), _le(name_offsets), bytes(texts), bytes(name_blob)]
+
+    # write beside the target and swap it in, so processes that still map
+    # the old file keep reading consistent pages
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(b"".join(parts))
+    os.replace(tmp, path)
+
+
+class MappedAyahs(Sequence):
+    """Read-only sequence of ayahs backed by an mmap of a corpus .bin file."""
+
+    def __init__(self, path):
+        if sys.byteorder != "little":
+            raise RuntimeError("mapped corpus files require a little-endian host")
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buf = memoryview(self._mm)
+        magic, n, slots, text_size = HEADER.unpack_from(buf)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a corpus file")
+        self._n = n
+
+        pos = HEADER.size
+        self.columns = {}
+        for name in INT_COLUMNS:
+            self.columns[name] = buf[pos:pos + 2 * n].cast("H")
+            pos += 2 * n + _pad(2 * n)
+        self._text_offsets = buf[pos:pos + 4 * (n + 1)].cast("I")
+        pos += 4 * (n + 1)
+        self._name_offsets = buf[pos:pos + 4 * (slots + 1)].cast("I")
+        pos += 4 * (slots + 1)
+        self._texts = buf[pos:pos + text_size]
+        pos += text_size
+        names = buf[pos:]
+        # 114 short strings: decode them once rather than on every access
+        self._names = [
+            str(names[self._name_offsets[s]:self._name_offsets[s + 1]], "utf-8")
+            for s in range(slots)
+        ]
+
+    def __len__(self):
+        return self._n
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [AyahRow(self, j) for j in range(*i.indices(self._n))]
+        if i < 0:
+            i += self._n
+        if not 0 <= i < self._n:
+            raise IndexError("ayah index out of range")
+        return AyahRow(self, i)
+
+    def __iter__(self):
+        for i in range(self._n):
+            yield AyahRow(self, i)
+
+    def field(self, i, key):
+        if key == "text":
+            return str(self._texts[self._text_offsets[i]:self._text_offsets[i + 1]], "utf-8")
+        if key == "ayah_key":
+            return f"{self.columns['surah'][i]}:{self.columns['ayah'][i]}"
+        if key == "surah_name":
+            return self._names[self.columns["surah"][i]]
+        if key == "page":
+            return self.columns["page"][i] or None
+        if key in self.columns:
+            return self.columns[key][i]
+        raise KeyError(key)
+
+
+class AyahRow(Mapping):
+    """Dict-like view of one mapped ayah; fields are decoded on access."""
+
+    __slots__ = ("_ayahs", "index")
+
+    def __init__(self, ayahs, index):
+        self._ayahs = ayahs
+        self.index = index
+
+    def __getitem__(self, key):
+        return self._ayahs.field(self.index, key)
+
+    def __iter__(self):
+        return iter(FIELDS)
+
+    def __len__(self):
+        return len(FIELDS)
+
+    def __eq__(self, other):
+        if isinstance(other, AyahRow):
+            return self._ayahs is other._ayahs and self.index == other.index
+        return Mapping.__eq__(self, other)
+
+    def __hash__(self):
+        return hash((id(self._ayahs), self.index))
+
+    def __repr__(self):
+        return f"AyahRow({dict(self)!r})"
+
+
+def main():
+    here = Path(__file__).parent
+    parser = argparse.ArgumentParser(description="Compile master_quran.json into a mapped corpus file.")
+    parser.add_argument("source", nargs="?", default=here / "master_quran.json")
+    parser.add_argument("target", nargs="?", default=here / "master_quran.bin")
+    args = parser.parse_args()
+
+    with open(args.source, "r", encoding="utf-8") as f:
+        ayahs = json.load(f)
+    write_corpus_bin(ayahs, args.target)
+    print(f"Wrote {len(ayahs)} ayahs to {args.target} ({os.path.getsize(args.target)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
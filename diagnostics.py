@@ -0,0 +1,146 @@
+"""Opt-in timing of rerun phases and drill generators.
+
+Enable with ``QMT_DIAGNOSTICS=1`` in the server environment to time every
+session, or with ``QMT_DIAGNOSTICS=url`` to time only sessions opened with
+``?diagnostics=1`` in the app URL; without the variable the URL switch
+does nothing, so visitors cannot make the server write. Each timed rerun
+is appended as one JSON line to ``diagnostics.jsonl``, which is moved to
+``diagnostics.jsonl.1`` once it passes ``MAX_LOG_BYTES``::
+
+    {"ts": ..., "session": ..., "kind": "rerun", "total_ms": ..., "phases": {"corpus": ..., ...}}
+
+Laps split the script into consecutive phases; ``phase()`` and ``timed()``
+time nested work (each drill, each fragment), which the enclosing lap
+also includes.
+
+When disabled, ``current()`` returns a shared no-op timer, so the hooks
+cost one attribute lookup and an empty ``with`` block.
+"""
+import contextlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+ENV_VAR = "QMT_DIAGNOSTICS"
+URL_SWITCH = "url"
+LOG_PATH = Path(__file__).parent / "diagnostics.jsonl"
+MAX_LOG_BYTES = 16 * 1024 * 1024
+
+_NULL_CONTEXT = contextlib.nullcontext()
+_local = threading.local()  # Streamlit runs each session's script on its own thread
+_log_lock = threading.Lock()
+
+
+def enabled_by_env():
+    return os.environ.get(ENV_VAR, "") not in ("", "0", URL_SWITCH)
+
+
+def url_switch_allowed():
+    return os.environ.get(ENV_VAR, "") == URL_SWITCH
+
+
+class NullTimer:
+    enabled = False
+
+    def phase(self, name):
+        return _NULL_CONTEXT
+
+    def lap(self, name):
+        pass
+
+
+NULL_TIMER = NullTimer()
+
+
+class Timer:
+    """Phase timings of one rerun (or one fragment rerun)."""
+
+    enabled = True
+
+    def __init__(self, kind, session, log_path=LOG_PATH):
+        self.kind = kind
+        self.session = session
+        self.log_path = log_path
+        self.phases = {}
+        self._started = self._lap = time.perf_counter()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            # repeated phases (one per question, say) add up
+            self.phases[name] = self.phases.get(name, 0.0) + (time.perf_counter() - t) * 1000
+
+    def lap(self, name):
+        """Charge the time since the previous lap (or the start) to ``name``."""
+        now = time.perf_counter()
+        self.phases[name] = self.phases.get(name, 0.0) + (now - self._lap) * 1000
+        self._lap = now
+
+    def finish(self):
+        """Stop timing, append the record to the log and return it."""
+        record = {
+            "ts": round(time.time(), 3),
+            "session": self.session,
+            "kind": self.kind,
+            "total_ms": round((time.perf_counter() - self._started) * 1000, 3),
+            "phases": {name: round(ms, 3) for name, ms in self.phases.items()},
+        }
+        if getattr(_local, "timer", None) is self:
+            _local.timer = None
+        if self.log_path is not None:
+            line = json.dumps(record) + "\n"
+            with _log_lock:
+                try:
+                    if os.path.getsize(self.log_path) > MAX_LOG_BYTES:
+                        # keep one previous file, so the log stays bounded
+                        os.replace(self.log_path, f"{self.log_path}.1")
+                except FileNotFoundError:
+                    pass
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(line)
+        return record
+
+
+def start(kind, session, enabled):
+    """Begin timing on this thread; returns the timer (``NULL_TIMER`` when disabled)."""
+    if not enabled:
+        _local.timer = None
+        return NULL_TIMER
+    timer = _local.timer = Timer(kind, session)
+    return timer
+
+
+def current():
+    """The timer running on this thread, or ``NULL_TIMER``."""
+    return getattr(_local, "timer", None) or NULL_TIMER
+
+
+@contextlib.contextmanager
+def _own_timer(kind, name, session, on_record):
+    timer = start(kind, session, True)
+    try:
+        with timer.phase(name):
+            yield
+    finally:
+        record = timer.finish()
+        if on_record is not None:
+            on_record(record)
+
+
+def timed(name, session, enabled, kind="fragment", on_record=None):
+    """Time ``name`` as a phase of the running timer, or as its own record.
+
+    Used for code that also runs alone, like a fragment rerun, where no
+    rerun timer is active.
+    """
+    if not enabled:
+        return _NULL_CONTEXT
+    timer = current()
+    if timer.enabled:
+        return timer.phase(name)
+    return _own_timer(kind, name, session, on_record)
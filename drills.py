@@ -0,0 +1,552 @@
+"""Question generation.
+
+Every drill type is a ``Drill`` subclass registered in ``DRILLS``; its
+``generate`` takes the corpus, a filtered ``Selection`` and the mode, and
+returns a ``Question`` (or ``None`` when the selection cannot support it).
+Answers are corpus indices, resolved against the corpus when rendered.
+
+``prefer`` lists selection positions to ask first (due and weak reviews,
+most urgent first) and ``weights`` (a ``sampling.SelectionWeights``)
+biases the Test Mode samples towards past mistakes; drills that cannot
+target an ayah ignore both.
+"""
+import functools
+import random
+from array import array
+from bisect import bisect_right
+from itertools import accumulate
+from dataclasses import dataclass
+
+import diagnostics
+from search import search_index, short_key
+from similar import neighbor_table
+from tokens import word_table
+
+STUDY_MODE = "Study Mode"
+TEST_MODE  = "Test Mode"
+MODES = (STUDY_MODE, TEST_MODE)
+
+
+@dataclass(frozen=True)
+class Question:
+    type: str
+    content: str
+    answers: object  # range or array("H") of corpus indices
+
+
+# - Registry: drill key -> drill, in the order questions are asked -
+DRILLS = {}
+
+
+def register(cls):
+    DRILLS[cls.key] = cls()
+    return cls
+
+
+class Drill:
+    key = None
+    label = None
+
+    def generate(self, corpus, selection, mode, rng, prefer=(), weights=None):
+        raise NotImplementedError
+
+
+# - Shared sampling -
+def test_sample_count(total):
+    return min(int(0.6 * total), 20)
+
+
+# ayahs a word drill asks in Study Mode: one prompt line (and for Next
+# Words one index lookup) per ayah, so not the whole selection
+STUDY_WORD_COUNT = 40
+
+
+def _first(prefer, total, count):
+    """Up to ``count`` distinct preferred positions below ``total``."""
+    return list(dict.fromkeys(p for p in prefer if 0 <= p < total))[:count]
+
+
+def sample_positions(total, mode, rng, prefer=(), sampler=None, count=None):
+    """Positions in the selection: all of them in Study Mode, a sample in Test Mode.
+
+    Study Mode asks the ``prefer`` positions first, the rest in a random
+    order. With a ``sampling.FenwickSampler`` over the positions, the Test
+    Mode sample is drawn by weight instead of uniformly. A ``count``
+    samples that many positions (at most ``total``) in either mode.
+    """
+    if mode == STUDY_MODE and count is None:
+        first = _first(prefer, total, total)
+        taken = set(first)
+        rest = [p for p in range(total) if p not in taken]
+        rng.shuffle(rest)
+        return first + rest
+    if prefer or sampler is not None:
+        count = test_sample_count(total) if count is None else min(count, total)
+        picks = _first(prefer, total, count)
+        if sampler is not None:
+            picks += sampler.sample(count - len(picks), rng, exclude=picks)
+        else:
+            taken = set(picks)
+            picks += rng.sample([p for p in range(total) if p not in taken], count - len(picks))
+    else:
+        picks = rng.sample(range(total), test_sample_count(total) if count is None else min(count, total))
+    rng.shuffle(picks)
+    return picks
+
+
+@functools.lru_cache(maxsize=8)
+def _word_starts(table, selection):
+    # word w of the selection's words lies in position bisect_right(starts, w) - 1
+    return list(accumulate((table.length(i) for i in selection.indices), initial=0))
+
+
+def sample_words(corpus, selection, mode, rng, prefer=(), sampler=None):
+    """``(corpus index, word index)`` pairs to ask about, one word per pick.
+
+    Study Mode: a random word of ``STUDY_WORD_COUNT`` ayahs, preferred
+    positions first. Test Mode: words drawn uniformly from all the words of
+    the selection, so an ayah comes up in proportion to its length; with
+    preferred positions or a ``sampler`` the ayahs are drawn as in
+    ``sample_positions`` instead, a random word each.
+    """
+    table = word_table(corpus)
+    total = len(selection.indices)
+    if mode == STUDY_MODE or prefer or sampler is not None:
+        count = STUDY_WORD_COUNT if mode == STUDY_MODE else None
+        picks = [selection.indices[p] for p in sample_positions(total, mode, rng, prefer, sampler, count)]
+        return [(i, rng.randrange(table.length(i))) for i in picks]
+    starts = _word_starts(table, selection)
+    out = []
+    for w in rng.sample(range(starts[-1]), min(test_sample_count(total), starts[-1])):
+        p = bisect_right(starts, w) - 1
+        out.append((selection.indices[p], w - starts[p]))
+    return out
+
+
+def sample_rukus(spans, mode, rng, prefer=(), sampler=None):
+    """Study Mode: every ruku in a random order. Test Mode: all if <=8, else 8-10.
+
+    Rukus holding a ``prefer`` position come first when all are asked.
+    ``sampler`` (over ``spans``) draws the Test Mode rukus by weight.
+    """
+    # rukus holding a preferred ayah
+    starts = [span[2] for span in spans]
+    preferred = (bisect_right(starts, p) - 1 for p in prefer)
+    if mode == STUDY_MODE or len(spans) <= 8:
+        first = _first(preferred, len(spans), len(spans))
+        taken = set(first)
+        rest = [span for n, span in enumerate(spans) if n not in taken]
+        rng.shuffle(rest)
+        return [spans[n] for n in first] + rest
+    count = min(rng.randint(8, 10), len(spans))
+    if not prefer and sampler is None:
+        return rng.sample(spans, count)
+    first = _first(preferred, len(spans), count)
+    if sampler is not None:
+        return [spans[n] for n in first + sampler.sample(count - len(first), rng, exclude=first)]
+    taken = set(first)
+    rest = [span for n, span in enumerate(spans) if n not in taken]
+    return [spans[n] for n in first] + rng.sample(rest, count - len(first))
+
+
+def next_rukus(spans, mode, rng):
+    """A run of rukus following a random starting ruku, or None if there is no next ruku."""
+    if len(spans) < 2:
+        return None
+    # only pick among those with at least one successor
+    idx = rng.randrange(len(spans) - 1)
+    if mode == STUDY_MODE:
+        return spans[idx+1:]
+    remaining = len(spans) - (idx + 1)
+    if remaining < 3:
+        return spans[idx+1:]
+    x = rng.randint(3, min(10, remaining))
+    return spans[idx+1 : idx+1 + x]
+
+
+def _key(corpus, i):
+    return corpus.ayahs[i]["ayah_key"]
+
+
+def _isolate(text):
+    # first-strong isolate, so the Arabic keeps its direction inside the English prompt
+    return f"\u2068{text}\u2069"
+
+
+# - Drills -
+@register
+class RandomKeys(Drill):
+    key = "random_keys"
+    label = "Random Ayahs"
+
+    def generate(self, corpus, selection, mode, rng, prefer=(), weights=None):
+        sampler = weights and weights.positions(self.key)
+        positions = sample_positions(len(selection.ayahs), mode, rng, prefer, sampler)
+        picks = array("H", (selection.indices[p] for p in positions))
+        keys = [_key(corpus, i) for i in picks]
+        return Question(self.key, f"Recite the following ayahs: {', '.join(keys)}", picks)
+
+
+@register
+class RandomKeysFollowing(Drill):
+    key = "random_keys_following"
+    label = "Random Ayahs (Following)"
+
+    def generate(self, corpus, selection, mode, rng, prefer=(), weights=None):
+        total = len(selection.ayahs)
+        # exclude last ayah since no following; reviews are graded on the answer
+        sampler = weights and weights.positions(self.key, 1)
+        picks = [p for p in sample_positions(total, mode, rng, [p - 1 for p in prefer], sampler)
+                 if p < total-1]
+        keys = [selection.ayahs[p]["ayah_key"] for p in picks]
+        answers = array("H", (selection.indices[p + 1] for p in picks))
+        return Question(self.key, f"Recite the ayah following these ayahs: {', '.join(keys)}", answers)
+
+
+@register
+class RandomKeysPrevious(Drill):
+    key = "random_keys_previous"
+    label = "Random Ayahs (Previous)"
+
+    def generate(self, corpus, selection, mode, rng, prefer=(), weights=None):
+        total = len(selection.ayahs)
+        # exclude first ayah since no previous
+        sampler = weights and weights.positions(self.key, -1)
+        picks = [p for p in sample_positions(total, mode, rng, [p + 1 for p in prefer], sampler) if p > 0]
+        keys = [selection.ayahs[p]["ayah_key"] for p in picks]
+        answers = array("H", (selection.indices[p - 1] for p in picks))
+        return Question(self.key, f"Recite the ayah preceding these ayahs: {', '.join(keys)}", answers)
+
+
+@register
+class RangeDrill(Drill):
+    key = "range_drill"
+    label = "Limited Range Recital"
+
+    def generate(self, corpus, selection, mode, rng, prefer=(), weights=None):
+        total = len(selection.ayahs)
+        # 1. Pick a single random ayah (or the most urgent review)
+        start_idx = prefer[0] if prefer else rng.randrange(total)
+        pick = selection.ayahs[start_idx]
+        start_key = pick["ayah_key"]
+        j, r = pick["juzz"], pick["ruku"]
+
+        if mode == STUDY_MODE:
+            # 2. Look for the next ruku (in reading order) within the filtered range
+            next_span = selection.ruku_by_ordinal.get(corpus.ruku_ordinal[(j, r)] + 1)
+            if next_span:
+                # 3a. If the next ruku exists, end at its last ayah
+                end_idx = next_span[3] - 1
+                end_key = selection.ayahs[end_idx]["ayah_key"]
+                return Question(self.key,
+                                f"Recite from ayah {start_key} until the end of the next ruku "
+                                f"– ayah {end_key}.",
+                                selection.answer_span(start_idx, end_idx+1))
+        else:
+            # Test Mode: to the end of the next quarter of the full Quran (wrapping into the next juzz)
+            start = selection.indices[start_idx]
+            q = corpus.quarter_at(start) + 1
+            if q < len(corpus.quarter_spans):
+                end = corpus.quarter_spans[q][3] - 1
+                end_key = corpus.ayahs[end]["ayah_key"]
+                return Question(self.key,
+                                f"Recite from ayah {start_key} to the end of the next quarter "
+                                f"– ayah {end_key}.",
+                                range(start, end+1))
+
+        # Otherwise end at the very end of the selected range
+        end_key = selection.ayahs[-1]["ayah_key"]
+        return Question(self.key,
+                        f"Recite from ayah {start_key} till the end of the selected range "
+                        f"– ayah {end_key}.",
+                        selection.answer_span(start_idx, total))
+
+
+@register
+class ReverseRangeDrill(Drill):
+    key = "reverse_range_drill"
+    label = "Reverse Limited Range Recital"
+
+    def generate(self, corpus, selection, mode, rng, prefer=(), weights=None):
+        start_idx = prefer[0] if prefer else rng.randrange(len(selection.ayahs))
+        pick = selection.ayahs[start_idx]
+        start_key = pick["ayah_key"]
+        j, r = pick["juzz"], pick["ruku"]
+
+        if mode == STUDY_MODE:
+            prev_span = selection.ruku_by_ordinal.get(corpus.ruku_ordinal[(j, r)] - 1)
+            if prev_span:
+                end_idx = prev_span[2]
+                end_key = selection.ayahs[end_idx]["ayah_key"]
+                return Question(self.key,
+                                f"Recite backwards from ayah {start_key} to the start of the previous ruku "
+                                f"– ayah {end_key}.",
+                                selection.answer_span(end_idx, start_idx+1)[::-1])
+        else:
+            start = selection.indices[start_idx]
+            q = corpus.quarter_at(start) - 1
+            if q >= 0:
+                end = corpus.quarter_spans[q][2]
+                end_key = corpus.ayahs[end]["ayah_key"]
+                return Question(self.key,
+                                f"Recite backwards from ayah {start_key} to the start of the previous quarter "
+                                f"– ayah {end_key}.",
+                                range(end, start+1)[::-1])
+
+        end_key = selection.ayahs[0]["ayah_key"]
+        return Question(self.key,
+                        f"Recite backwards from ayah {start_key} till the start of the selected range "
+                        f"– ayah {end_key}.",
+                        selection.answer_span(0, start_idx+1)[::-1])
+
+
+@register
+class RukuDrill(Drill):
+    key = "ruku_drill"
+    label = "Ruku Recital"
+
+    def generate(self, corpus, selection, mode, rng, prefer=(), weights=None):
+        picks = sample_rukus(selection.ruku_spans, mode, rng, prefer, weights and weights.rukus(self.key))
+        keys = [f"J{j}-R{r}" for j, r, _, _ in picks]
+        # Answers: first 5 ayahs of each
+        answers = array("H")
+        for _, _, start, end in picks:
+            answers.extend(selection.indices[start:min(start + 5, end)])
+        return Question(self.key, f"Recite the first 5 ayahs of the following rukus: {', '.join(keys)}", answers)
+
+
+@register
+class RukuLastDrill(Drill):
+    key = "ruku_last_drill"
+    label = "Ruku Last Recital"
+
+    def generate(self, corpus, selection, mode, rng, prefer=(), weights=None):
+        picks = sample_rukus(selection.ruku_spans, mode, rng, prefer, weights and weights.rukus(self.key))
+        keys = [f"J{j}-R{r}" for j, r, _, _ in picks]
+        # Answers: last 5 ayahs of each
+        answers = array("H")
+        for _, _, start, end in picks:
+            answers.extend(selection.indices[max(end - 5, start):end])
+        return Question(self.key, f"Recite the last 5 ayahs of the following rukus: {', '.join(keys)}", answers)
+
+
+@register
+class NextRukuFirstDrill(Drill):
+    key = "next_ruku_first_drill"
+    label = "Next Ruku Recital"
+
+    def generate(self, corpus, selection, mode, rng, prefer=(), weights=None):
+        picks = next_rukus(selection.ruku_spans, mode, rng)
+        if not picks:
+            return None
+        # the prompt only shows the very next ruku
+        first_j, first_r = picks[0][:2]
+        content = (
+            f"Recite the first ayah of the next {len(picks)} rukus starting from "
+            f"J{first_j} Ruku {first_r}"
+        )
+        return Question(self.key, content, array("H", (selection.indices[start] for _, _, start, _ in picks)))
+
+
+@register
+class NextRukuLastDrill(Drill):
+    key = "next_ruku_last_drill"
+    label = "Next Ruku First Ayah Drill"
+
+    def generate(self, corpus, selection, mode, rng, prefer=(), weights=None):
+        picks = next_rukus(selection.ruku_spans, mode, rng)
+        if not picks:
+            return None
+        first_j, first_r = picks[0][:2]
+        content = (
+            f"Recite the last ayah of the next {len(picks)} rukus: "
+            f"J{first_j} Ruku {first_r}"
+        )
+        return Question(self.key, content, array("H", (selection.indices[end - 1] for _, _, _, end in picks)))
+
+
+@register
+class SkipAyahDrill(Drill):
+    key = "skip_ayah_drill"
+    label = "Ayah Intervals"
+
+    def generate(self, corpus, selection, mode, rng, prefer=(), weights=None):
+        ayahs = selection.ayahs
+        # only proceed if there's at least one "next" ayah
+        if len(ayahs) < 2:
+            return None
+        # pick a start ayah (never the very last one) and a step between 2 and 5
+        starts = _first(prefer, len(ayahs) - 1, 1)
+        idx  = starts[0] if starts else rng.randrange(len(ayahs) - 1)
+        step = rng.randint(2, 5)
+        max_count = 5 if mode == STUDY_MODE else 10
+
+        # every step-th ayah, as a start/stop/step span of corpus indices
+        picks = selection.answer_span(idx, min(len(ayahs), idx + step * max_count), step)
+        count = len(picks)
+
+        suffix  = {1: "st", 2: "nd", 3: "rd"}.get(step, "th")
+        ordinal = f"{step}{suffix}"
+        start, last = ayahs[idx], corpus.ayahs[picks[-1]]
+        s, a = start["surah"], start["ayah"]
+        last_s, last_a = last["surah"], last["ayah"]
+
+        # mention either the count or that it runs to the end of range
+        if count < max_count:
+            content = (
+                f"Recite every {ordinal} ayah from {s}:{a} "
+                f"until the end of the selected range (ending at {last_s}:{last_a})"
+            )
+        else:
+            content = f"Recite every {ordinal} ayah from {s}:{a} for {count} ayahs"
+        return Question(self.key, content, picks)
+
+
+@register
+class IdentifyAyahDrill(Drill):
+    key = "identify_ayah_drill"
+    label = "Identify the Ayah"
+
+    # (fragments asked, words per fragment); Test Mode shows less of each ayah
+    SIZES = {STUDY_MODE: (5, 6), TEST_MODE: (10, 3)}
+
+    def generate(self, corpus, selection, mode, rng, prefer=(), weights=None):
+        index = search_index(corpus)
+        table = word_table(corpus)
+        count, size = self.SIZES[mode]
+        sampler = weights and weights.positions(self.key)
+        positions = sample_positions(len(selection.ayahs), mode, rng, prefer, sampler, count)
+        fragments = []
+        for p in positions:
+            text_words = table.of(selection.indices[p])
+            lo = rng.randrange(max(1, len(text_words) - size + 1))
+            hi = min(len(text_words), lo + size)
+            text = " ".join(text_words[lo:hi])
+            whole = " ".join(text_words)
+            note = ""
+            if short_key(whole):
+                # too short for the trigram index (الٓمٓ): show it all and
+                # count the ayahs that are nothing but the same letters
+                text = whole
+                shared = len(index.same_short_key(whole))
+                if shared > 1:
+                    note = f" (in {shared} ayahs)"
+            elif len(index.find(whole, limit=2)) > 1:
+                # the whole ayah recurs, so no part of it is unique
+                note = f" (in {len(index.find(text))} ayahs)"
+            else:
+                # widen until the fragment has a key to look up and no
+                # other ayah in the corpus holds it
+                while short_key(text) or len(index.find(text, limit=2)) > 1:
+                    if hi < len(text_words):
+                        hi += 1
+                    else:
+                        lo -= 1
+                    text = " ".join(text_words[lo:hi])
+            fragments.append(f"{len(fragments) + 1}. {_isolate(text)}{note}")
+        answers = array("H", (selection.indices[p] for p in positions))
+        return Question(self.key, f"Name the surah and ayah of each fragment: {'; '.join(fragments)}", answers)
+
+
+@register
+class SimilarAyahDrill(Drill):
+    key = "similar_ayah_drill"
+    label = "Similar Ayahs (Mutashabihat)"
+
+    COUNT = {STUDY_MODE: 5, TEST_MODE: 10}
+
+    def generate(self, corpus, selection, mode, rng, prefer=(), weights=None):
+        table = neighbor_table(corpus)
+        text_words = word_table(corpus)
+        # selection positions whose ayah shares a run of words with a look-alike
+        has_run = [table.run_stops[i] > 0 for i in selection.indices]
+        candidates = [p for p, ok in enumerate(has_run) if ok]
+        if not candidates:
+            return None
+        count = self.COUNT[mode]
+        # due and weak reviews first; weights are ignored, the pool is already narrow
+        picks = _first([p for p in prefer if 0 <= p < len(has_run) and has_run[p]], len(has_run), count)
+        taken = set(picks)
+        picks += rng.sample([p for p in candidates if p not in taken], min(count, len(candidates)) - len(picks))
+
+        lines = []
+        for n, p in enumerate(picks, 1):
+            i = selection.indices[p]
+            start, stop = table.shared_run(i)
+            run = text_words.text(i, start, stop)
+            lead = "… " if start else ""
+            others = ", ".join(_key(corpus, j) for j in table.of(i)[:3])
+            lines.append(f"{n}. {_key(corpus, i)} (like {others}): {_isolate(f'{lead}{run} …')}")
+        return Question(self.key, f"Continue each ayah past the words it shares with its look-alikes: "
+                                  f"{'; '.join(lines)}", array("H", (selection.indices[p] for p in picks)))
+
+
+
+@register
+class ContinueWordDrill(Drill):
+    key = "continue_word_drill"
+    label = "Continue From a Word"
+
+    def generate(self, corpus, selection, mode, rng, prefer=(), weights=None):
+        table = word_table(corpus)
+        sampler = weights and weights.positions(self.key)
+        picks = sample_words(corpus, selection, mode, rng, prefer, sampler)
+        lines = [f"{n}. {_key(corpus, i)}, word {k + 1}: {_isolate(table.word(i, k))}"
+                 for n, (i, k) in enumerate(picks, 1)]
+        return Question(self.key, f"Continue each ayah from the given word: {'; '.join(lines)}",
+                        array("H", (i for i, _ in picks)))
+
+
+@register
+class NextWordsDrill(Drill):
+    key = "next_words_drill"
+    label = "Next Words"
+
+    # words shown before the ones to recite
+    SHOWN = 3
+
+    def generate(self, corpus, selection, mode, rng, prefer=(), weights=None):
+        table = word_table(corpus)
+        index = search_index(corpus)
+        sampler = weights and weights.positions(self.key)
+        picks = sample_words(corpus, selection, mode, rng, prefer, sampler)
+        lines, answers = [], array("H")
+        for n, (i, k) in enumerate(picks, 1):
+            # the shown words end at word k; after an ayah's last word comes the next ayah
+            text = table.text(i, max(0, k - self.SHOWN + 1), k + 1)
+            last = k == table.length(i) - 1
+            answers.append(i + 1 if last and i + 1 < len(corpus.ayahs) else i)
+            # name the ayah only when the words alone do not pin it down
+            where = f" ({_key(corpus, i)})" if len(index.find(text, limit=2)) > 1 else ""
+            lines.append(f"{n}. {_isolate(f'{text} …')}{where}")
+        return Question(self.key, f"Recite what comes after each run of words: {'; '.join(lines)}", answers)
+
+
+# - Friendly labels and fixed sequence of question types -
+LABELS = {key: drill.label for key, drill in DRILLS.items()}
+QUESTION_TYPE_ORDER = list(DRILLS)
+
+
+def generate_questions(corpus, selection, mode, enabled=None, rng=None, priority=None, weights=None):
+    """One question per enabled drill type, in ``QUESTION_TYPE_ORDER``.
+
+    ``enabled`` restricts the drill keys used (default: all of them) and
+    ``rng`` is any ``random.Random``-compatible source. ``priority`` maps a
+    drill key to corpus indices to ask first (see ``reviews.review_priorities``)
+    and ``weights`` is a ``sampling.SelectionWeights`` over ``selection``.
+    """
+    priority = priority or {}
+    timer = diagnostics.current()
+    if not selection.ayahs:
+        raise ValueError("cannot generate questions for an empty selection")
+    rng = rng if rng is not None else random.Random()
+    enabled = QUESTION_TYPE_ORDER if enabled is None else enabled
+    questions = []
+    for key in QUESTION_TYPE_ORDER:
+        if key in enabled:
+            prefer = selection.positions_of(priority[key]) if key in priority else ()
+            with timer.phase(f"drill.{key}"):
+                question = DRILLS[key].generate(corpus, selection, mode, rng, prefer, weights)
+            if question is not None:
+                questions.append(question)
+    return questions
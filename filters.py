@@ -0,0 +1,194 @@
+import functools
+from array import array
+from bisect import bisect_left, bisect_right
+
+from corpus import build_position_index, build_ruku_spans
+
+# filtered selections kept per process, shared by every session
+SELECTION_CACHE_SIZE = 128
+
+# ayahs in the longest surah, Al-Baqarah
+MAX_AYAH = 286
+
+
+def _span_mask(start, stop):
+    return ((1 << (stop - start)) - 1) << start
+
+
+def mask_to_indices(mask):
+    """Positions of the set bits of ``mask``, ascending."""
+    out = []
+    pos = 0
+    while mask:
+        # skip the run of zeros, then take the run of ones in one step
+        zeros = (mask & -mask).bit_length() - 1
+        mask >>= zeros
+        pos += zeros
+        ones = (~mask & (mask + 1)).bit_length() - 1
+        out.extend(range(pos, pos + ones))
+        mask >>= ones
+        pos += ones
+    return out
+
+
+class FilterEngine:
+    """Per-juzz/quarter/surah/ruku bitmasks over the corpus, in corpus order.
+
+    Bit ``i`` stands for ``corpus.ayahs[i]``. A selection is the OR of the
+    masks picked in the sidebar, so its ayahs come out already in reading
+    order and never need sorting.
+    """
+
+    def __init__(self, corpus):
+        self.juzz    = {}
+        self.quarter = {}
+        self.surah   = {}
+        self.ruku    = {}  # (juzz, ruku) -> mask
+        self.ruku_numbers = {}  # juzz -> its ruku numbers, ascending
+        self.surah_spans = {}  # surah -> (start, stop)
+        self.ayah_numbers = []
+
+        runs = {"juzz": [], "quarter": [], "surah": [], "ruku": []}
+        for i, a in enumerate(corpus.ayahs):
+            values = {"juzz": a["juzz"], "quarter": a["quarter"], "surah": a["surah"],
+                      "ruku": (a["juzz"], a["ruku"])}
+            for name, value in values.items():
+                run = runs[name]
+                if run and run[-1][0] == value:
+                    run[-1][2] = i + 1
+                else:
+                    run.append([value, i, i + 1])
+            self.ayah_numbers.append(a["ayah"])
+
+        for name, run in runs.items():
+            masks = getattr(self, name)
+            for value, start, stop in run:
+                masks[value] = masks.get(value, 0) | _span_mask(start, stop)
+        for surah, start, stop in runs["surah"]:
+            self.surah_spans[surah] = (start, stop)
+        for juzz, ruku in sorted(self.ruku):
+            self.ruku_numbers.setdefault(juzz, []).append(ruku)
+
+    def ayah_range_mask(self, surah, first, last):
+        if surah not in self.surah_spans:
+            return 0
+        start, stop = self.surah_spans[surah]
+        lo = bisect_left(self.ayah_numbers, first, start, stop)
+        hi = bisect_right(self.ayah_numbers, last, start, stop)
+        return _span_mask(lo, hi) if lo < hi else 0
+
+    def ruku_range_mask(self, juzz, first, last):
+        # only the rukus that exist, however wide the range
+        numbers = self.ruku_numbers.get(juzz, [])
+        mask = 0
+        for r in numbers[bisect_left(numbers, first):bisect_right(numbers, last)]:
+            mask |= self.ruku[(juzz, r)]
+        return mask
+
+    def select_mask(self, juzz_sel=(), quarter_sel=(), surah_sel=(), ruku_ranges=(), ayah_ranges=()):
+        mask = 0
+        for j in juzz_sel:
+            mask |= self.juzz.get(j, 0)
+        for q in quarter_sel:
+            mask |= self.quarter.get(q, 0)
+        for s in surah_sel:
+            mask |= self.surah.get(s, 0)
+        for j, first, last in ruku_ranges:
+            mask |= self.ruku_range_mask(j, first, last)
+        for s, first, last in ayah_ranges:
+            mask |= self.ayah_range_mask(s, first, last)
+        return mask
+
+    def select(self, *args, **kwargs):
+        """Corpus indices matching any of the given filters, in reading order."""
+        return mask_to_indices(self.select_mask(*args, **kwargs))
+
+
+@functools.lru_cache(maxsize=2)
+def filter_engine(corpus):
+    return FilterEngine(corpus)
+
+
+def filter_signature(juzz_sel=(), quarter_sel=(), surah_sel=(), ruku_ranges=(), ayah_ranges=()):
+    """Canonical, hashable form of a sidebar filter.
+
+    Order and duplicates do not change the selection, so they do not change
+    the signature either.
+    """
+    def ranges(rs):
+        return tuple(sorted({tuple(int(x) for x in r) for r in rs}))
+    return (
+        tuple(sorted(set(juzz_sel))),
+        tuple(sorted(set(quarter_sel))),
+        tuple(sorted(set(surah_sel))),
+        ranges(ruku_ranges),
+        ranges(ayah_ranges),
+    )
+
+
+def check_signature(corpus, signature):
+    """Raise ``ValueError`` unless every value of ``signature`` could come from the sidebar.
+
+    Signatures from quiz codes and API requests are untrusted; the sidebar
+    only offers what ``corpus`` holds and ayah numbers up to ``MAX_AYAH``.
+    """
+    juzz_sel, quarter_sel, surah_sel, ruku_ranges, ayah_ranges = signature
+    for name, values, known in (("juzz", juzz_sel, corpus.all_juzz),
+                                ("quarter", quarter_sel, corpus.all_quarter),
+                                ("surah", surah_sel, corpus.all_surah)):
+        unknown = set(values) - set(known)
+        if unknown:
+            raise ValueError(f"no {name} {min(unknown)} in the corpus")
+    for j, first, last in ruku_ranges:
+        if not 1 <= first <= last <= corpus.max_ruku.get(j, 0):
+            raise ValueError(f"ruku range {j}:{first}-{last} is out of range")
+    for s, first, last in ayah_ranges:
+        if s not in corpus.surah_names or not 1 <= first <= last <= MAX_AYAH:
+            raise ValueError(f"ayah range {s}:{first}-{last} is out of range")
+
+
+class Selection:
+    """The ayahs matching one filter signature, plus the indexes drills use.
+
+    Shared across sessions through ``cached_selection``.
+    """
+
+    def __init__(self, corpus, indices):
+        # corpus indices, in reading order; uint16 covers all 6,236 ayahs
+        self.indices = array("H", indices)
+        self.ayahs = [corpus.ayahs[i] for i in indices]
+        # ayah_key -> position in self.ayahs
+        self.positions = build_position_index(self.ayahs)
+        # ruku spans of the selection, and the same spans keyed by global ordinal
+        self.ruku_spans = build_ruku_spans(self.ayahs)
+        self.ruku_by_ordinal = {corpus.ruku_ordinal[span[:2]]: span for span in self.ruku_spans}
+
+    def answer_span(self, start, stop, step=1):
+        """Corpus indices of selection positions ``start:stop:step`` (``step > 0``).
+
+        Returned as a ``range`` when those positions are contiguous in the
+        corpus, otherwise as an ``array`` slice; either way the question
+        stores a few bytes per ayah rather than the ayahs themselves.
+        """
+        positions = range(start, stop, step)
+        if not positions:
+            return range(0)
+        first, last = positions[0], positions[-1]
+        if self.indices[last] - self.indices[first] == last - first:
+            return range(self.indices[first], self.indices[last] + 1, step)
+        return self.indices[start:stop:step]
+
+    def positions_of(self, indices):
+        """Selection positions of those corpus ``indices`` that are selected, in the given order."""
+        out = []
+        for i in indices:
+            p = bisect_left(self.indices, i)
+            if p < len(self.indices) and self.indices[p] == i:
+                out.append(p)
+        return out
+
+
+@functools.lru_cache(maxsize=SELECTION_CACHE_SIZE)
+def cached_selection(corpus, signature):
+    """Selection for a ``filter_signature``; LRU-cached per process."""
+    return Selection(corpus, filter_engine(corpus).select(*signature))
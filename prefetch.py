@@ -0,0 +1,79 @@
+"""Background generation of the next question set.
+
+A prefetch picks a seed and runs ``cached_questions`` for it on a small
+per-process thread pool, so the set is already in the shared quiz cache
+when Generate is clicked. At most ``MAX_IN_FLIGHT`` prefetches are queued
+or running per process; beyond that ``prefetch`` declines and the click
+generates synchronously as before.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from quiz import cached_questions, new_seed
+
+PREFETCH_WORKERS = 2
+MAX_IN_FLIGHT = 8
+
+_lock = threading.Lock()
+_executor = None
+_in_flight = 0
+
+
+class Prefetch:
+    """One question set being generated for ``(signature, mode)``."""
+
+    def __init__(self, corpus, signature, mode, seed, future):
+        self.corpus = corpus
+        self.signature = signature
+        self.mode = mode
+        self.seed = seed
+        self.future = future
+
+    def matches(self, corpus, signature, mode):
+        return (self.corpus, self.signature, self.mode) == (corpus, signature, mode)
+
+    def cancel(self):
+        """Drop the prefetch; one already running finishes, but nobody waits for it."""
+        self.future.cancel()
+
+    def ready_seed(self):
+        """The seed of the prefetched set, waiting for it if it is already running.
+
+        ``None`` when it had not started yet (it is cancelled instead, since
+        generating in the script thread is no slower) or when it failed.
+        """
+        if self.future.cancel():
+            return None
+        try:
+            self.future.result()
+        except Exception:
+            return None
+        return self.seed
+
+
+def _pool():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(PREFETCH_WORKERS, thread_name_prefix="prefetch")
+        return _executor
+
+
+def _release(future):
+    global _in_flight
+    with _lock:
+        _in_flight -= 1
+
+
+def prefetch(corpus, signature, mode):
+    """Start generating a set in the background; ``None`` when the pool is saturated."""
+    global _in_flight
+    with _lock:
+        if _in_flight >= MAX_IN_FLIGHT:
+            return None
+        _in_flight += 1
+    seed = new_seed()
+    future = _pool().submit(cached_questions, corpus, signature, mode, seed)
+    # also runs on cancel, so the slot is always given back
+    future.add_done_callback(_release)
+    return Prefetch(corpus, signature, mode, seed, future)
@@ -0,0 +1,141 @@
+"""Reproducible question sets and the short codes used to share them.
+
+A question set is fully determined by (filter signature, mode, seed), so it
+is generated once per process and then served from ``cached_questions``
+to everyone who asks for the same quiz. ``encode_quiz_code`` packs those
+three values, and the drill types when not all are enabled, into a
+URL-safe code that rebuilds the set anywhere.
+"""
+import base64
+import functools
+import random
+
+from drills import MODES, QUESTION_TYPE_ORDER, generate_questions
+from filters import cached_selection, check_signature, filter_signature
+
+# question sets kept per process, shared by every session
+QUIZ_CACHE_SIZE = 256
+
+_CODE_VERSION = 2
+
+
+# seeds are 32 bits, as ``new_seed`` draws them
+MAX_SEED = 2**32 - 1
+
+
+def new_seed():
+    return random.SystemRandom().getrandbits(32)
+
+
+def cached_questions(corpus, signature, mode, seed, enabled=None):
+    """The question set for a quiz, as a tuple of ``Question``; LRU-cached per process.
+
+    ``enabled`` must be hashable (a tuple of drill keys) when given.
+    """
+    # lru_cache keys on how the arguments were passed, so every call
+    # reaches it the same way whether or not ``enabled`` was given
+    return _cached_questions(corpus, signature, mode, seed, enabled)
+
+
+@functools.lru_cache(maxsize=QUIZ_CACHE_SIZE)
+def _cached_questions(corpus, signature, mode, seed, enabled):
+    selection = cached_selection(corpus, signature)
+    return tuple(generate_questions(corpus, selection, mode, enabled, random.Random(seed)))
+
+
+# - Share codes: version, mode, seed, drills and the signature as varints, base64url -
+def _put_varint(out, value):
+    if value < 0:
+        raise ValueError("quiz codes only hold non-negative integers")
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return
+
+
+def _varints(data):
+    value = shift = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            yield value
+            value = shift = 0
+    if shift:
+        raise ValueError("truncated quiz code")
+
+
+def _drill_field(enabled):
+    # 0 for every drill; otherwise a bitmask over QUESTION_TYPE_ORDER shifted
+    # past a set low bit, so an explicitly empty set stays distinct from "all"
+    if enabled is None:
+        return 0
+    mask = 0
+    for n, key in enumerate(QUESTION_TYPE_ORDER):
+        if key in enabled:
+            mask |= 1 << n
+    return mask << 1 | 1
+
+
+def _enabled_from(field):
+    if not field:
+        return None
+    mask = field >> 1
+    if not field & 1 or mask >> len(QUESTION_TYPE_ORDER):
+        raise ValueError("unsupported quiz code")
+    return tuple(key for n, key in enumerate(QUESTION_TYPE_ORDER) if mask >> n & 1)
+
+
+def encode_quiz_code(signature, mode, seed, enabled=None):
+    """The share code of a question set; ``enabled`` as given to ``cached_questions``."""
+    juzz_sel, quarter_sel, surah_sel, ruku_ranges, ayah_ranges = signature
+    out = bytearray()
+    for value in (_CODE_VERSION, MODES.index(mode), seed, _drill_field(enabled)):
+        _put_varint(out, value)
+    for values in (juzz_sel, quarter_sel, surah_sel):
+        _put_varint(out, len(values))
+        for value in values:
+            _put_varint(out, value)
+    for ranges in (ruku_ranges, ayah_ranges):
+        _put_varint(out, len(ranges))
+        for rng in ranges:
+            for value in rng:
+                _put_varint(out, value)
+    return base64.urlsafe_b64encode(bytes(out)).rstrip(b"=").decode("ascii")
+
+
+def decode_quiz_code(code, corpus):
+    """Return ``(signature, mode, seed, enabled)``; raises ``ValueError`` for a malformed code.
+
+    ``enabled`` is ``None`` for every drill, else a tuple of drill keys in
+    ``QUESTION_TYPE_ORDER``, ready to pass to ``cached_questions``.
+
+    A code whose filters do not fit ``corpus`` (see ``filters.check_signature``)
+    is rejected too, so a pasted code never builds an unbounded selection.
+    """
+    code = code.strip()
+    try:
+        data = base64.urlsafe_b64decode(code + "=" * (-len(code) % 4))
+    except (ValueError, TypeError) as e:
+        raise ValueError("not a quiz code") from e
+    values = _varints(data)
+    try:
+        version, mode_idx, seed = next(values), next(values), next(values)
+        if version != _CODE_VERSION or mode_idx >= len(MODES):
+            raise ValueError("unsupported quiz code")
+        enabled = _enabled_from(next(values))
+        # list comprehensions, not generator expressions: StopIteration must propagate
+        lists = [[next(values) for _ in range(next(values))] for _ in range(3)]
+        ranges = [[[next(values) for _ in range(3)] for _ in range(next(values))]
+                  for _ in range(2)]
+    except StopIteration as e:
+        raise ValueError("truncated quiz code") from e
+    if next(values, None) is not None:
+        raise ValueError("trailing data in quiz code")
+    signature = filter_signature(*lists, *ranges)
+    check_signature(corpus, signature)
+    return signature, MODES[mode_idx], seed, enabled
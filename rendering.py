@@ -0,0 +1,40 @@
+"""HTML for revealed answers."""
+import functools
+
+# revealed answers shown per page of one question
+ANSWER_PAGE_SIZE = 50
+# per-ayah fragments shared by every session: both forms of every ayah
+# of the full Quran fit, a few MB at most
+FRAGMENT_CACHE_SIZE = 16384
+
+
+def ayah_html(a, include_info=False):
+    """One revealed ayah: centred right-to-left text, with its juzz/ruku/key above it or its key after it."""
+    if include_info:
+        meta = f"Juzz {a['juzz']}, Ruku {a['ruku']}, Ayah {a['ayah_key']} <br>"
+        html  = f"<div class='ayah-meta'>{meta}</div>"
+        html += "<div dir='rtl' style='text-align: center; margin-bottom:1em;'>"
+        html += a['text']
+        html += "</div>"
+    else:
+        html  = "<div dir='rtl' style='text-align: center; margin-bottom:1em;'>"
+        html += f"{a['text']} - ({a['ayah_key']})"
+        html += "</div>"
+    return html
+
+
+@functools.lru_cache(maxsize=FRAGMENT_CACHE_SIZE)
+def ayah_fragment(corpus, index, include_info=False):
+    return ayah_html(corpus.ayahs[index], include_info)
+
+
+def answers_html(corpus, answers, include_info=False):
+    """The given answers (corpus indices) as one HTML block, from cached fragments."""
+    return "".join([ayah_fragment(corpus, i, include_info) for i in answers])
+
+
+def page_bounds(shown, page, page_size=ANSWER_PAGE_SIZE):
+    """``(pages, start, stop)`` of 1-based ``page`` over the first ``shown`` answers."""
+    pages = max(1, -(-shown // page_size))
+    page = min(max(page, 1), pages)
+    return pages, (page - 1) * page_size, min(page * page_size, shown)
@@ -0,0 +1,183 @@
+"""Spaced-repetition review store: one SM-2 card per (user, ayah, drill).
+
+Cards live in a local SQLite database in WAL mode, so Streamlit sessions
+can read while another one writes. Grades are buffered and written in
+batches; the due queue is read through the ``(user, due_at)`` index and
+never scans a user's whole history.
+"""
+import atexit
+import functools
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+REVIEWS_PATH = Path(__file__).parent / "reviews.db"
+
+# button label -> SM-2 quality (0-5)
+GRADES = {"Again": 1, "Hard": 3, "Good": 4, "Easy": 5}
+
+DAY = 86400.0
+# a failed card comes back after ten minutes, not a day
+RELEARN_INTERVAL = 10 * 60 / DAY
+INITIAL_EASE = 2.5
+MIN_EASE = 1.3
+
+# pending grades are written once this many pile up, or this old
+FLUSH_SIZE = 32
+FLUSH_SECONDS = 5.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reviews (
+    user        TEXT    NOT NULL,
+    ayah_key    TEXT    NOT NULL,
+    drill       TEXT    NOT NULL,
+    ease        REAL    NOT NULL,
+    interval    REAL    NOT NULL,  -- days
+    reps        INTEGER NOT NULL,
+    lapses      INTEGER NOT NULL,
+    due_at      REAL    NOT NULL,  -- unix time
+    reviewed_at REAL    NOT NULL,
+    PRIMARY KEY (user, ayah_key, drill)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS reviews_due ON reviews (user, due_at);
+CREATE INDEX IF NOT EXISTS reviews_weak ON reviews (user, ease);
+"""
+
+UPSERT = """
+INSERT INTO reviews (user, ayah_key, drill, ease, interval, reps, lapses, due_at, reviewed_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (user, ayah_key, drill) DO UPDATE SET
+    ease = excluded.ease, interval = excluded.interval, reps = excluded.reps,
+    lapses = excluded.lapses, due_at = excluded.due_at, reviewed_at = excluded.reviewed_at
+"""
+
+
+def sm2(card, quality, now):
+    """Next ``(ease, interval, reps, lapses, due_at)`` of a card after one grade.
+
+    ``card`` is the current ``(ease, interval, reps, lapses)``, or ``None``
+    for an ayah that was never graded.
+    """
+    ease, interval, reps, lapses = card or (INITIAL_EASE, 0.0, 0, 0)
+    ease = max(MIN_EASE, ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+    if quality < 3:
+        reps, lapses, interval = 0, lapses + 1, RELEARN_INTERVAL
+    else:
+        reps += 1
+        interval = 1.0 if reps == 1 else 6.0 if reps == 2 else interval * ease
+    return ease, interval, reps, lapses, now + interval * DAY
+
+
+def card_weight(ease, lapses):
+    """Sampling weight of a card: 1 for an ungraded ayah, more for lapses and low ease."""
+    return max(0.25, 1.0 + lapses + 2 * (INITIAL_EASE - ease))
+
+
+class ReviewStore:
+    """Thread-safe access to the review database, shared by every session."""
+
+    def __init__(self, path=REVIEWS_PATH):
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._pending = {}  # (user, ayah_key, drill) -> card row, not yet written
+        self._last_flush = time.monotonic()
+
+    def _card(self, key):
+        if key in self._pending:
+            return self._pending[key][3:7]
+        return self._conn.execute(
+            "SELECT ease, interval, reps, lapses FROM reviews WHERE user = ? AND ayah_key = ? AND drill = ?",
+            key,
+        ).fetchone()
+
+    def record(self, user, ayah_key, drill, quality, now=None):
+        """Grade one answer and return the new card; written with the next batch."""
+        now = time.time() if now is None else now
+        key = (user, ayah_key, drill)
+        with self._lock:
+            card = sm2(self._card(key), quality, now)
+            self._pending[key] = key + card + (now,)
+            if (len(self._pending) >= FLUSH_SIZE
+                    or time.monotonic() - self._last_flush >= FLUSH_SECONDS):
+                self._flush()
+        return card
+
+    def _flush(self):
+        if self._pending:
+            with self._conn:
+                self._conn.execute("BEGIN")
+                self._conn.executemany(UPSERT, self._pending.values())
+            self._pending.clear()
+        self._last_flush = time.monotonic()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def queue(self, user, now=None, weak_limit=200):
+        """``(ayah_key, drill)`` pairs to ask first: due cards by due date, then weak ones.
+
+        Due cards come from a range scan of ``(user, due_at)``. A card that is
+        not yet due is weak when it has lapsed or lost ease (below
+        ``INITIAL_EASE``); those come from ``(user, ease)``, weakest first, at
+        most ``weak_limit`` of them. Cards graded Good or Easy wait for their
+        due date.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            self._flush()
+            due = self._conn.execute(
+                "SELECT ayah_key, drill FROM reviews WHERE user = ? AND due_at <= ? ORDER BY due_at",
+                (user, now),
+            ).fetchall()
+            weak = self._conn.execute(
+                "SELECT ayah_key, drill FROM reviews WHERE user = ? AND due_at > ? "
+                "AND (ease < ? OR lapses > 0) ORDER BY ease LIMIT ?",
+                (user, now, INITIAL_EASE, weak_limit),
+            ).fetchall()
+        return due + weak
+
+    def cards(self, user):
+        """``(ayah_key, drill, ease, lapses)`` of every card of ``user``."""
+        with self._lock:
+            self._flush()
+            return self._conn.execute(
+                "SELECT ayah_key, drill, ease, lapses FROM reviews WHERE user = ?", (user,)
+            ).fetchall()
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            self._conn.close()
+
+
+@functools.lru_cache(maxsize=None)
+def review_store(path=REVIEWS_PATH):
+    """One ``ReviewStore`` per database per process; flushed at exit."""
+    store = ReviewStore(path)
+    atexit.register(store.flush)
+    return store
+
+
+def review_priorities(store, user, corpus, now=None):
+    """Drill key -> corpus indices to ask first, most urgent first."""
+    priorities = {}
+    for ayah_key, drill in store.queue(user, now):
+        i = corpus.positions.get(ayah_key)
+        if i is not None:
+            priorities.setdefault(drill, []).append(i)
+    return priorities
+
+
+def review_weights(store, user, corpus):
+    """Drill key -> {corpus index: ``card_weight``} for ``sampling.SelectionWeights``."""
+    weights = {}
+    for ayah_key, drill, ease, lapses in store.cards(user):
+        i = corpus.positions.get(ayah_key)
+        if i is not None:
+            weights.setdefault(drill, {})[i] = card_weight(ease, lapses)
+    return weights
@@ -0,0 +1,146 @@
+"""Weighted sampling without replacement over a selection.
+
+A ``FenwickSampler`` keeps the weights in a Fenwick (binary indexed) tree:
+building it is O(n), changing one weight is O(log n) and drawing k distinct
+items is O(k log n), so a grade only touches the tree instead of rebuilding
+cumulative weights for the next Generate.
+"""
+from bisect import bisect_right
+
+
+class FenwickSampler:
+    def __init__(self, weights):
+        self._w = [float(w) for w in weights]
+        n = len(self._w)
+        self._tree = [0.0] + self._w
+        for i in range(1, n + 1):
+            parent = i + (i & -i)
+            if parent <= n:
+                self._tree[parent] += self._tree[i]
+        self._top = 1 << (n.bit_length() - 1) if n else 0
+        self._nonzero = sum(1 for w in self._w if w > 0)
+
+    def __len__(self):
+        return len(self._w)
+
+    def weight(self, i):
+        return self._w[i]
+
+    def _add(self, i, delta):
+        i += 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def update(self, i, weight):
+        weight = max(float(weight), 0.0)
+        old = self._w[i]
+        self._nonzero += (weight > 0) - (old > 0)
+        self._w[i] = weight
+        self._add(i, weight - old)
+
+    @property
+    def total(self):
+        # sum of the whole tree: prefix up to n
+        s, i = 0.0, len(self._w)
+        while i:
+            s += self._tree[i]
+            i -= i & -i
+        return s
+
+    def find(self, u):
+        """Index of the item whose cumulative weight interval holds ``u``."""
+        pos, step = 0, self._top
+        while step:
+            nxt = pos + step
+            if nxt < len(self._tree) and self._tree[nxt] <= u:
+                pos = nxt
+                u -= self._tree[nxt]
+            step >>= 1
+        return min(pos, len(self._w) - 1)
+
+    def sample(self, k, rng, exclude=()):
+        """Up to ``k`` distinct indices, each draw proportional to its weight.
+
+        ``exclude`` indices are never drawn. Weights are restored afterwards.
+        """
+        removed = {}
+        for i in exclude:
+            if i not in removed and self._w[i] > 0:
+                removed[i] = self._w[i]
+                self.update(i, 0)
+        picks = []
+        try:
+            while len(picks) < k and self._nonzero:
+                i = self.find(rng.random() * self.total)
+                if self._w[i] <= 0:
+                    # float rounding at an interval edge; draw again
+                    continue
+                picks.append(i)
+                removed[i] = self._w[i]
+                self.update(i, 0)
+        finally:
+            for i, w in removed.items():
+                self.update(i, w)
+        return picks
+
+
+class SelectionWeights:
+    """Per-drill samplers over one selection, kept current as grades come in.
+
+    ``weights`` maps a drill key to ``{corpus index: weight}``; ayahs without
+    a weight count as 1. Ruku samplers weigh each ruku by the mean of its
+    ayahs.
+    """
+
+    def __init__(self, selection, weights):
+        self.selection = selection
+        self._ruku_starts = [span[2] for span in selection.ruku_spans]
+        self._weights = {}  # drill -> {selection position: weight}
+        for drill, by_index in weights.items():
+            own = self._weights[drill] = {}
+            for i, weight in by_index.items():
+                for pos in selection.positions_of([i]):
+                    own[pos] = weight
+        self._samplers = {}  # (drill, offset) or (drill, "ruku") -> FenwickSampler
+
+    def _weight(self, drill, pos):
+        return self._weights.get(drill, {}).get(pos, 1.0)
+
+    def positions(self, drill, offset=0):
+        """Sampler over selection positions; position ``p`` carries the weight of ``p + offset``."""
+        key = (drill, offset)
+        if key not in self._samplers:
+            total = len(self.selection.indices)
+            self._samplers[key] = FenwickSampler(
+                self._weight(drill, p + offset) if 0 <= p + offset < total else 0.0
+                for p in range(total))
+        return self._samplers[key]
+
+    def rukus(self, drill):
+        """Sampler over ``selection.ruku_spans``."""
+        key = (drill, "ruku")
+        if key not in self._samplers:
+            self._samplers[key] = FenwickSampler(
+                sum(self._weight(drill, p) for p in range(start, end)) / (end - start)
+                for _, _, start, end in self.selection.ruku_spans)
+        return self._samplers[key]
+
+    def update(self, drill, index, weight):
+        """Set the weight of corpus ``index`` for ``drill`` in every sampler built so far."""
+        found = self.selection.positions_of([index])
+        if not found:
+            return
+        pos = found[0]
+        old = self._weight(drill, pos)
+        self._weights.setdefault(drill, {})[pos] = weight
+        for (d, kind), sampler in self._samplers.items():
+            if d != drill:
+                continue
+            if kind == "ruku":
+                n = bisect_right(self._ruku_starts, pos) - 1
+                _, _, start, end = self.selection.ruku_spans[n]
+                sampler.update(n, sampler.weight(n) + (weight - old) / (end - start))
+            elif 0 <= pos - kind < len(sampler):
+                sampler.update(pos - kind, weight)
+
@@ -0,0 +1,117 @@
+"""Fragment search over the ayah text.
+
+Every ayah is indexed by the character trigrams of its search key: the
+normalized words (see ``arabic.normalize``) without alefs, one space
+between them and one at each end. The Uthmani script writes many long
+vowels as a superscript alef (ٱلْكِتَٰبُ), so keys without alefs find
+what people type, and the spaces keep a match from running across a
+word boundary (الله is not in قيل لهم).
+
+A query's rarest trigram picks the candidate ayahs. Only those are
+checked for the whole fragment, against the normalized text with its
+alefs: each alef of the query may be missing from the ayah but the ayah
+may not hold one the query lacks, and the match must begin a word or
+follow a joined particle (و ف ب ل ك). So الله matches ٱللَّهِ, لِلَّهِ and
+بِٱللَّهِ, not ٱلضَّلَٰلَةَ or أَمْوَٰلَهُمْ. A lookup touches a few ayahs
+instead of all.
+"""
+import functools
+import re
+from array import array
+
+from arabic import normalize
+
+# letters a query needs, alefs included; a key left with fewer letters
+# once alefs are dropped (قال is قل) only matches whole words
+MIN_QUERY_LENGTH = 3
+
+# particles written joined to the next word: a match may start after them
+_PREFIXES = "[وفبلك]{0,2}"
+
+
+def _without_alefs(normalized):
+    return " ".join(filter(None, (w.replace("ا", "") for w in normalized.split())))
+
+
+def search_key(text):
+    """The normalized words of ``text`` without alefs, separated by single spaces."""
+    return _without_alefs(normalize(text))
+
+
+def query_length(text):
+    """Letters of ``text`` once normalized, alefs included."""
+    return len(normalize(text).replace(" ", ""))
+
+
+def short_key(text):
+    """True when the key of ``text`` has under ``MIN_QUERY_LENGTH`` letters."""
+    return len(search_key(text).replace(" ", "")) < MIN_QUERY_LENGTH
+
+
+def trigrams(text):
+    return {text[i:i+3] for i in range(len(text) - 2)}
+
+
+class SearchIndex:
+    """Trigram postings over the search keys of every ayah.
+
+    ``texts`` holds the normalized text of every ayah, padded with a
+    space at each end. ``postings`` maps a trigram of the padded keys to
+    the corpus indices of the ayahs holding it, ascending, as
+    ``array("H")``; ``short_keys`` maps each whole-ayah key under
+    ``MIN_QUERY_LENGTH`` letters (الٓمٓ is لم) to its ayahs the same way.
+    """
+
+    def __init__(self, corpus):
+        self.texts = [f" {normalize(a['text'])} " for a in corpus.ayahs]
+        postings, short_keys = {}, {}
+        # ayahs are visited in order, so every postings list comes out sorted
+        for i, text in enumerate(self.texts):
+            key = _without_alefs(text)
+            for gram in trigrams(f" {key} "):
+                postings.setdefault(gram, []).append(i)
+            if len(key.replace(" ", "")) < MIN_QUERY_LENGTH:
+                short_keys.setdefault(key, []).append(i)
+        self.postings = {gram: array("H", ayahs) for gram, ayahs in postings.items()}
+        self.short_keys = {key: array("H", ayahs) for key, ayahs in short_keys.items()}
+
+    def find(self, query, limit=None):
+        """Corpus indices of the ayahs containing ``query``, in reading order.
+
+        Marks and letter variants are ignored on both sides, and alefs the
+        ayah leaves out. The words of the query must appear together, in
+        order: the first begins a word (joined particles aside), the inner
+        ones are whole and the last may stop short. A key under
+        ``MIN_QUERY_LENGTH`` letters matches whole words only. Returns at
+        most ``limit`` indices, and none for a query under
+        ``MIN_QUERY_LENGTH`` letters.
+        """
+        normalized = normalize(query)
+        if len(normalized.replace(" ", "")) < MIN_QUERY_LENGTH:
+            return []
+        fragment = _without_alefs(normalized)
+        pattern = "".join("ا?" if ch == "ا" else re.escape(ch) for ch in normalized)
+        if len(fragment.replace(" ", "")) < MIN_QUERY_LENGTH:
+            fragment, pattern = f" {fragment} ", f" {pattern} "
+        else:
+            pattern = f" {_PREFIXES}{pattern}"
+        lists = [self.postings.get(gram) for gram in trigrams(fragment)]
+        if not all(lists):
+            return []
+        matches = re.compile(pattern).search
+        found = []
+        for i in min(lists, key=len):
+            if matches(self.texts[i]):
+                found.append(i)
+                if limit is not None and len(found) >= limit:
+                    break
+        return found
+
+    def same_short_key(self, text):
+        """Corpus indices of the ayahs whose whole key is the short key of ``text``."""
+        return self.short_keys.get(search_key(text), array("H"))
+
+
+@functools.lru_cache(maxsize=2)
+def search_index(corpus):
+    return SearchIndex(corpus)
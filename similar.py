@@ -0,0 +1,277 @@
+"""Similar ayahs (mutashabihat), found with MinHash and LSH banding.
+
+Each ayah is reduced to the set of its normalized word bigrams (see
+``arabic.normalize``). ``NUM_BANDS * BAND_ROWS`` MinHash values summarize
+each set; ayahs sharing all the rows of any band become candidate pairs,
+and only those pairs get their exact Jaccard similarity computed. That
+avoids comparing all ~19 million pairs of the full Quran.
+
+The result is a neighbor table: for every ayah, up to ``MAX_NEIGHBORS``
+ayahs with Jaccard >= ``MIN_SIMILARITY``, most similar first, the cluster
+(connected group of similar ayahs) it belongs to, and the longest run of
+words it shares with one of them while still going on past it. It is
+compiled offline next to the corpus::
+
+    python similar.py [master_quran.json] [master_quran.sim]
+
+Layout (little-endian)::
+
+    header      "QMS2", ayah count n, neighbor count m, corpus fingerprint
+    offsets     uint32[n + 1]
+    neighbors   uint16[m]         corpus indices
+    clusters    uint16[n]         0 for an ayah without neighbors
+    run starts  uint16[n]         word indices (see ``arabic.words``)
+    run stops   uint16[n]         0 when no shared run leaves words to continue with
+    scores      uint8[m]          Jaccard * 255
+
+``neighbor_table`` uses the file when its fingerprint matches the corpus
+and otherwise computes the table in memory, which takes a few seconds for
+the full Quran; the app and the API server call it at load so no request
+waits for that.
+"""
+import argparse
+import functools
+import json
+import os
+import random
+import struct
+import sys
+import threading
+import time
+import zlib
+from array import array
+from difflib import SequenceMatcher
+from pathlib import Path
+
+from arabic import normalize
+
+SIMILAR_PATH = Path(__file__).parent / "master_quran.sim"
+
+MAGIC = b"QMS2"
+HEADER = struct.Struct("<4sIII")
+
+# look-alikes often share only an opening or a closing phrase, so the bar
+# is low; 40 bands of 2 rows make a pair at Jaccard 0.2 a candidate ~80%
+# of the time, at 0.3 ~98%
+NUM_BANDS = 40
+BAND_ROWS = 2
+MIN_SIMILARITY = 0.2
+MAX_NEIGHBORS = 8
+# a shared run shorter than this is not what makes two ayahs confusable
+MIN_SHARED_WORDS = 2
+# fixed, so every build draws the same hash functions
+HASH_SEED = 0x51A
+
+_PRIME = (1 << 61) - 1
+
+_lock = threading.Lock()
+
+
+def shingles(words):
+    """Word bigrams of the normalized ``words`` (the word itself for a one-word ayah)."""
+    if len(words) < 2:
+        return set(words)
+    return {f"{a} {b}" for a, b in zip(words, words[1:])}
+
+
+def shared_run(words, others):
+    """``(start, stop)`` of the longest run of ``words`` found in one of ``others``.
+
+    Runs under ``MIN_SHARED_WORDS`` words, and runs that reach the end of
+    ``words`` (nothing left to continue with), count as none: ``(0, 0)``.
+    """
+    best = (0, 0)
+    for other in others:
+        a, _, size = SequenceMatcher(None, words, other, autojunk=False).find_longest_match(
+            0, len(words), 0, len(other))
+        if size >= MIN_SHARED_WORDS and a + size < len(words) and size > best[1] - best[0]:
+            best = (a, a + size)
+    return best
+
+
+def _hash_functions(count, seed=HASH_SEED):
+    rng = random.Random(seed)
+    return [(rng.randrange(1, _PRIME), rng.randrange(_PRIME)) for _ in range(count)]
+
+
+def minhash(shingle_set, functions):
+    # crc32, not hash(): string hashes change from one process to the next
+    hashes = [zlib.crc32(s.encode("utf-8")) for s in shingle_set] or [0]
+    return [min([(a * h + b) % _PRIME for h in hashes]) for a, b in functions]
+
+
+def fingerprint(ayahs):
+    """CRC-32 of every ayah text, so a table is never used with another corpus."""
+    crc = 0
+    for a in ayahs:
+        crc = zlib.crc32(a["text"].encode("utf-8"), crc)
+    return crc
+
+
+def candidate_pairs(signatures):
+    """Pairs ``(i, j)``, ``i < j``, whose signatures agree on at least one band."""
+    pairs = set()
+    for band in range(NUM_BANDS):
+        lo = band * BAND_ROWS
+        buckets = {}
+        for i, signature in enumerate(signatures):
+            buckets.setdefault(tuple(signature[lo:lo + BAND_ROWS]), []).append(i)
+        for members in buckets.values():
+            for n, i in enumerate(members):
+                for j in members[n + 1:]:
+                    pairs.add((i, j))
+    return pairs
+
+
+class NeighborTable:
+    """Similar ayahs of every ayah, in corpus indices."""
+
+    def __init__(self, offsets, neighbors, scores, clusters, run_starts, run_stops):
+        self.offsets = offsets
+        self.neighbors = neighbors
+        self.scores = scores
+        self.clusters = clusters
+        self.run_starts = run_starts
+        self.run_stops = run_stops
+
+    def of(self, i):
+        """Corpus indices of the ayahs similar to ayah ``i``, most similar first."""
+        return self.neighbors[self.offsets[i]:self.offsets[i + 1]]
+
+    def similarity(self, i):
+        """Jaccard similarity of each of ``of(i)``, as 0-255."""
+        return self.scores[self.offsets[i]:self.offsets[i + 1]]
+
+    def shared_run(self, i):
+        """``(start, stop)`` words of ayah ``i`` shared with a look-alike, or ``None``."""
+        stop = self.run_stops[i]
+        return (self.run_starts[i], stop) if stop else None
+
+    @classmethod
+    def build(cls, ayahs):
+        # the words of arabic.words(), normalized
+        texts = [normalize(a["text"]).split() for a in ayahs]
+        sets = [shingles(words) for words in texts]
+        functions = _hash_functions(NUM_BANDS * BAND_ROWS)
+        signatures = [minhash(s, functions) for s in sets]
+
+        similar = [[] for _ in sets]
+        for i, j in candidate_pairs(signatures):
+            union = len(sets[i] | sets[j])
+            score = len(sets[i] & sets[j]) / union if union else 0.0
+            if score >= MIN_SIMILARITY:
+                similar[i].append((score, j))
+                similar[j].append((score, i))
+
+        offsets, neighbors, scores = array("I", [0]), array("H"), array("B")
+        run_starts, run_stops = array("H"), array("H")
+        for i, row in enumerate(similar):
+            # most similar first; ties in reading order
+            row.sort(key=lambda pair: (-pair[0], pair[1]))
+            for score, j in row[:MAX_NEIGHBORS]:
+                neighbors.append(j)
+                scores.append(round(score * 255))
+            offsets.append(len(neighbors))
+            start, stop = shared_run(texts[i], [texts[j] for _, j in row[:MAX_NEIGHBORS]])
+            run_starts.append(start)
+            run_stops.append(stop)
+        return cls(offsets, neighbors, scores, _clusters(similar), run_starts, run_stops)
+
+    # - File form -
+    def write(self, path, ayahs):
+        n, m = len(self.offsets) - 1, len(self.neighbors)
+        parts = [HEADER.pack(MAGIC, n, m, fingerprint(ayahs))]
+        for column in (self.offsets, self.neighbors, self.clusters, self.run_starts, self.run_stops,
+                       self.scores):
+            column = array(column.typecode, column)
+            if sys.byteorder != "little":
+                column.byteswap()
+            parts.append(column.tobytes())
+        path = Path(path)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(b"".join(parts))
+        os.replace(tmp, path)
+
+    @classmethod
+    def read(cls, path, ayahs):
+        """The table in ``path``, or ``None`` when it is missing, truncated or built from another corpus."""
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        if len(data) < HEADER.size:
+            return None
+        magic, n, m, crc = HEADER.unpack_from(data)
+        if magic != MAGIC or n != len(ayahs) or crc != fingerprint(ayahs):
+            return None
+        # offsets, neighbors, clusters, run starts, run stops, scores
+        if len(data) != HEADER.size + 4 * (n + 1) + 2 * m + 3 * 2 * n + m:
+            return None
+        columns, pos = [], HEADER.size
+        for typecode, count in (("I", n + 1), ("H", m), ("H", n), ("H", n), ("H", n), ("B", m)):
+            column = array(typecode)
+            column.frombytes(data[pos:pos + column.itemsize * count])
+            if sys.byteorder != "little":
+                column.byteswap()
+            columns.append(column)
+            pos += column.itemsize * count
+        offsets, neighbors, clusters, run_starts, run_stops, scores = columns
+        return cls(offsets, neighbors, scores, clusters, run_starts, run_stops)
+
+
+def _clusters(similar):
+    """Cluster number (from 1) of each ayah with neighbors, 0 for the others."""
+    parent = list(range(len(similar)))
+
+    def root(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, row in enumerate(similar):
+        for _, j in row:
+            parent[root(i)] = root(j)
+    numbers = {}
+    clusters = array("H")
+    for i, row in enumerate(similar):
+        clusters.append(numbers.setdefault(root(i), len(numbers) + 1) if row else 0)
+    return clusters
+
+
+@functools.lru_cache(maxsize=2)
+def _cached_table(corpus, path):
+    table = NeighborTable.read(path, corpus.ayahs)
+    return table if table is not None else NeighborTable.build(corpus.ayahs)
+
+
+def neighbor_table(corpus, path=SIMILAR_PATH):
+    """The compiled table at ``path`` if it matches ``corpus``, else one built now."""
+    # concurrent first calls wait for one build instead of each running their own
+    with _lock:
+        return _cached_table(corpus, path)
+
+
+def main():
+    here = Path(__file__).parent
+    parser = argparse.ArgumentParser(description="Compile the similar-ayah table of a corpus.")
+    parser.add_argument("source", nargs="?", default=here / "master_quran.json")
+    parser.add_argument("target", nargs="?", default=SIMILAR_PATH)
+    args = parser.parse_args()
+
+    with open(args.source, "r", encoding="utf-8") as f:
+        ayahs = json.load(f)
+    started = time.perf_counter()
+    table = NeighborTable.build(ayahs)
+    table.write(args.target, ayahs)
+    paired = sum(1 for i in range(len(ayahs)) if table.offsets[i + 1] > table.offsets[i])
+    runs = sum(1 for stop in table.run_stops if stop)
+    print(f"{paired} of {len(ayahs)} ayahs have look-alikes ({runs} with a shared run to continue), "
+          f"in {max(table.clusters, default=0)} clusters; "
+          f"wrote {args.target} ({os.path.getsize(args.target)} bytes) in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,14 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# the modules live at the repository root, next to QuranApp.py
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from corpus import load_corpus  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def corpus():
+    return load_corpus()
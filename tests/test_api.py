@@ -0,0 +1,40 @@
+import pytest
+
+from api_server import ApiError, count, generate, reveal
+from quiz import MAX_SEED
+
+
+@pytest.mark.parametrize("body", [
+    {"juzz": 0},
+    {"juzz": ""},
+    {"juzz": None},
+    {"juzz": [True]},
+    {"surah": [2.0]},
+    {"ruku": [[1, 1, False]]},
+    {"ayah": {}},
+])
+def test_count_rejects_bad_filters(corpus, body):
+    with pytest.raises(ApiError):
+        count(corpus, body)
+
+
+@pytest.mark.parametrize("body", [
+    {"mode": ["x"]},
+    {"mode": None},
+    {"drills": [["a"]]},
+    {"drills": [{}]},
+    {"drills": "ruku_drill"},
+    {"seed": True},
+    {"seed": -1},
+    {"seed": MAX_SEED + 1},
+])
+def test_generate_rejects_bad_options(corpus, body):
+    with pytest.raises(ApiError):
+        generate(corpus, {"juzz": [1], **body})
+
+
+def test_reveal_rejects_bool_question(corpus):
+    code = generate(corpus, {"juzz": [1], "mode": "test", "seed": MAX_SEED})["code"]
+    assert reveal(corpus, {"code": code, "question": 0})["question"] == 0
+    with pytest.raises(ApiError):
+        reveal(corpus, {"code": code, "question": False})
@@ -0,0 +1,55 @@
+import random
+
+import pytest
+
+from filters import filter_engine
+
+
+def old_filter(corpus, juzz_sel=(), quarter_sel=(), surah_sel=(), ruku_ranges=(), ayah_ranges=()):
+    # the list-based filtering the sidebar used before FilterEngine
+    def in_ruku(a):
+        return any(a["juzz"] == j and s <= a["ruku"] <= e for j, s, e in ruku_ranges)
+
+    def in_ayah(a):
+        return any(a["surah"] == s and s2 <= a["ayah"] <= e2 for s, s2, e2 in ayah_ranges)
+
+    filtered = [
+        a for a in corpus.ayahs
+        if ((juzz_sel and a["juzz"] in juzz_sel)
+            or (quarter_sel and a["quarter"] in quarter_sel)
+            or (surah_sel and a["surah"] in surah_sel)
+            or in_ruku(a)
+            or in_ayah(a))
+    ]
+    return [corpus.positions[a["ayah_key"]] for a in sorted(filtered, key=lambda x: (x["surah"], x["ayah"]))]
+
+
+@pytest.mark.parametrize("ruku_ranges, ayah_ranges", [
+    ([(1, 2, 5)], []),
+    ([(1, 3, 3), (1, 7, 9), (2, 1, 1)], []),
+    # past the last ruku: the range that looped over every number in it
+    ([(1, 1, 10**12)], []),
+    ([(1, 5, 2), (99, 1, 3)], []),
+    ([], [(2, 10, 20)]),
+    ([], [(2, 140, 286), (2, 1, 1), (3, 1, 5), (2, 9, 3)]),
+    ([(1, 2, 2)], [(2, 1, 10**12)]),
+])
+def test_ranges_match_list_filtering(corpus, ruku_ranges, ayah_ranges):
+    engine = filter_engine(corpus)
+    assert engine.select(ruku_ranges=ruku_ranges, ayah_ranges=ayah_ranges) == old_filter(
+        corpus, ruku_ranges=ruku_ranges, ayah_ranges=ayah_ranges)
+
+
+def test_random_filters_match_list_filtering(corpus):
+    engine = filter_engine(corpus)
+    rng = random.Random(5)
+    max_ruku = max(a["ruku"] for a in corpus.ayahs)
+    max_ayah = max(a["ayah"] for a in corpus.ayahs)
+    for _ in range(200):
+        filters = {
+            "juzz_sel": rng.sample(corpus.all_juzz, rng.randint(0, 1)),
+            "quarter_sel": rng.sample(corpus.all_quarter, rng.randint(0, 1)),
+            "ruku_ranges": [(1, *sorted(rng.sample(range(1, max_ruku + 3), 2))) for _ in range(rng.randint(0, 3))],
+            "ayah_ranges": [(2, *sorted(rng.sample(range(1, max_ayah + 3), 2))) for _ in range(rng.randint(0, 3))],
+        }
+        assert engine.select(**filters) == old_filter(corpus, **filters)
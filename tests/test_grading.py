@@ -0,0 +1,59 @@
+import random
+
+import pytest
+
+from grading import FAILED_QUALITY, edit_distance, grade
+
+
+def dp_distance(reference, typed):
+    # textbook quadratic Levenshtein over words
+    row = list(range(len(typed) + 1))
+    for i, a in enumerate(reference, 1):
+        prev, row[0] = row[0], i
+        for j, b in enumerate(typed, 1):
+            prev, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, prev + (a != b))
+    return row[-1]
+
+
+@pytest.mark.parametrize("reference, typed", [
+    ([], []),
+    ([], ["a"]),
+    (["a", "b"], []),
+    (["a"], ["a"]),
+    (["a", "b", "c"], ["c", "b", "a"]),
+])
+def test_edge_cases(reference, typed):
+    assert edit_distance(reference, typed) == dp_distance(reference, typed)
+
+
+def test_matches_dp_on_random_words():
+    rng = random.Random(24)
+    vocabulary = ["w%d" % n for n in range(6)]
+    for _ in range(3000):
+        # up to 150 words, past the 64 bits of a machine word
+        m = rng.choice([rng.randrange(8), rng.randrange(150)])
+        n = rng.choice([rng.randrange(8), rng.randrange(150)])
+        reference = [rng.choice(vocabulary) for _ in range(m)]
+        typed = [rng.choice(vocabulary) for _ in range(n)]
+        assert edit_distance(reference, typed) == dp_distance(reference, typed)
+
+
+def test_grade(corpus):
+    text = corpus.ayahs[1]["text"]
+    exact = grade(corpus, 1, text)
+    assert (exact.distance, exact.first_difference, exact.quality) == (0, None, 5)
+    assert grade(corpus, 1, "").quality == FAILED_QUALITY
+    words = text.split()
+    wrong = grade(corpus, 1, " ".join(words[:2] + ["خطا"] + words[3:]))
+    assert (wrong.distance, wrong.first_difference) == (1, 2)
+
+
+@pytest.mark.parametrize("index, typed", [
+    # 2:21: the Uthmani script joins the vocative, يَٰٓأَيُّهَا
+    (20, "يا أيها الناس اعبدوا ربكم الذي خلقكم والذين من قبلكم لعلكم تتقون"),
+    # 2:40: joined يَٰبَنِىٓ, and a lone hamza in إِسْرَٰٓءِيلَ where typed text seats it on ya
+    (39, "يا بني إسرائيل اذكروا نعمتي التي أنعمت عليكم وأوفوا بعهدي أوف بعهدكم وإياي فارهبون"),
+])
+def test_plain_keyboard_recitation(corpus, index, typed):
+    result = grade(corpus, index, typed)
+    assert (result.distance, result.first_difference, result.quality) == (0, None, 5)
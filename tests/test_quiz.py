@@ -0,0 +1,107 @@
+import base64
+
+import pytest
+
+from drills import MODES, QUESTION_TYPE_ORDER, TEST_MODE
+from filters import filter_signature
+from quiz import _CODE_VERSION, _cached_questions, _put_varint, cached_questions, decode_quiz_code, encode_quiz_code
+
+
+def raw_code(*values):
+    out = bytearray()
+    for value in values:
+        _put_varint(out, value)
+    return base64.urlsafe_b64encode(bytes(out)).rstrip(b"=").decode("ascii")
+
+
+@pytest.mark.parametrize("signature", [
+    filter_signature([1]),
+    filter_signature(quarter_sel=[1, 2], surah_sel=[2]),
+    filter_signature(ruku_ranges=[(1, 2, 5), (1, 7, 7)], ayah_ranges=[(2, 10, 20), (2, 286, 286)]),
+])
+@pytest.mark.parametrize("mode", MODES)
+@pytest.mark.parametrize("seed", [0, 127, 128, 2**32 - 1])
+def test_round_trip(corpus, signature, mode, seed):
+    code = encode_quiz_code(signature, mode, seed)
+    assert decode_quiz_code(code, corpus) == (signature, mode, seed, None)
+    # pasted with surrounding whitespace
+    assert decode_quiz_code(f"  {code}\n", corpus) == (signature, mode, seed, None)
+
+
+@pytest.mark.parametrize("enabled", [
+    (),
+    ("ruku_drill",),
+    tuple(QUESTION_TYPE_ORDER[::2]),
+    tuple(QUESTION_TYPE_ORDER),
+])
+def test_drills_round_trip(corpus, enabled):
+    signature = filter_signature([1])
+    # any order in, QUESTION_TYPE_ORDER out
+    code = encode_quiz_code(signature, TEST_MODE, 9, list(reversed(enabled)))
+    assert decode_quiz_code(code, corpus) == (signature, TEST_MODE, 9, enabled)
+
+
+def test_loaded_code_hits_the_cache(corpus):
+    # Generate leaves ``enabled`` out; a loaded code passes what it decodes
+    signature = filter_signature([1])
+    generated = cached_questions(corpus, signature, TEST_MODE, 11)
+    hits = _cached_questions.cache_info().hits
+    code = encode_quiz_code(signature, TEST_MODE, 11)
+    loaded = cached_questions(corpus, *decode_quiz_code(code, corpus))
+    assert loaded is generated
+    assert _cached_questions.cache_info().hits == hits + 1
+
+
+@pytest.mark.parametrize("field", [2, (1 << len(QUESTION_TYPE_ORDER) + 1) | 1])
+def test_bad_drill_field(corpus, field):
+    with pytest.raises(ValueError, match="unsupported"):
+        decode_quiz_code(raw_code(_CODE_VERSION, 0, 7, field, 1, 1, 0, 0, 0, 0), corpus)
+
+
+def test_truncated(corpus):
+    code = raw_code(_CODE_VERSION, 0, 7, 0, 1, 1, 0, 0, 0, 0)
+    with pytest.raises(ValueError, match="truncated"):
+        decode_quiz_code(raw_code(_CODE_VERSION, 0, 7, 0, 1), corpus)
+    # a varint cut off after a continuation byte
+    data = base64.urlsafe_b64decode(code + "==")[:2] + b"\x80"
+    with pytest.raises(ValueError, match="truncated"):
+        decode_quiz_code(base64.urlsafe_b64encode(data).decode("ascii"), corpus)
+    with pytest.raises(ValueError):
+        decode_quiz_code("", corpus)
+
+
+def test_trailing_data(corpus):
+    with pytest.raises(ValueError, match="trailing"):
+        decode_quiz_code(raw_code(_CODE_VERSION, 0, 7, 0, 1, 1, 0, 0, 0, 0, 5), corpus)
+
+
+def test_bad_version_or_mode(corpus):
+    # version 1, without a drill field, never shipped
+    with pytest.raises(ValueError, match="unsupported"):
+        decode_quiz_code(raw_code(1, 0, 7, 1, 1, 0, 0, 0, 0), corpus)
+    with pytest.raises(ValueError, match="unsupported"):
+        decode_quiz_code(raw_code(_CODE_VERSION + 1, 0, 7, 0, 1, 1, 0, 0, 0, 0), corpus)
+    with pytest.raises(ValueError, match="unsupported"):
+        decode_quiz_code(raw_code(_CODE_VERSION, len(MODES), 7, 0, 1, 1, 0, 0, 0, 0), corpus)
+
+
+@pytest.mark.parametrize("signature", [
+    filter_signature([99]),
+    filter_signature(quarter_sel=[0]),
+    filter_signature(surah_sel=[200]),
+    filter_signature(ruku_ranges=[(1, 1, 10**12)]),
+    filter_signature(ruku_ranges=[(1, 0, 1)]),
+    filter_signature(ruku_ranges=[(1, 3, 2)]),
+    filter_signature(ruku_ranges=[(30, 1, 1)]),
+    filter_signature(ayah_ranges=[(2, 1, 287)]),
+    filter_signature(ayah_ranges=[(200, 1, 2)]),
+])
+def test_out_of_range(corpus, signature):
+    with pytest.raises(ValueError, match="corpus|out of range"):
+        decode_quiz_code(encode_quiz_code(signature, TEST_MODE, 1), corpus)
+
+
+def test_pasted_huge_ruku_range(corpus):
+    # ruku range (1, 1, 10**12): rejected before any selection is built
+    with pytest.raises(ValueError, match="ruku range 1:1-1000000000000"):
+        decode_quiz_code("AgABAAAAAAEBAYCglKWNHQA", corpus)
@@ -0,0 +1,40 @@
+import random
+
+from drills import STUDY_MODE, STUDY_WORD_COUNT, sample_positions, sample_rukus, sample_words
+from filters import cached_selection, filter_signature
+from reviews import GRADES, ReviewStore
+
+
+def test_queue_skips_mastered_cards(tmp_path):
+    store = ReviewStore(tmp_path / "reviews.db")
+    now = 1_000_000.0
+    for n in range(30):
+        store.record("u", f"2:{n + 1}", "random_keys", GRADES["Easy"], now)
+    store.record("u", "2:31", "random_keys", GRADES["Good"], now)
+    store.record("u", "2:40", "random_keys", GRADES["Hard"], now)
+    store.record("u", "2:41", "random_keys", GRADES["Again"], now)
+    # the lapse is due again after ten minutes, the Hard card only the next day
+    assert store.queue("u", now + 60) == [("2:41", "random_keys"), ("2:40", "random_keys")]
+    assert store.queue("u", now + 3600)[0] == ("2:41", "random_keys")
+    store.close()
+
+
+def test_study_mode_asks_preferred_first():
+    picks = sample_positions(50, STUDY_MODE, random.Random(1), prefer=[30, 4, 30, 99])
+    assert picks[:2] == [30, 4]
+    assert sorted(picks) == list(range(50))
+
+
+def test_study_mode_rukus_preferred_first():
+    spans = [(1, r, 10 * r, 10 * r + 10) for r in range(12)]
+    picks = sample_rukus(spans, STUDY_MODE, random.Random(1), prefer=[75, 3])
+    assert picks[:2] == [spans[7], spans[0]]
+    assert sorted(picks) == spans
+
+
+def test_study_mode_word_drills_ask_a_sample(corpus):
+    selection = cached_selection(corpus, filter_signature([1]))
+    picks = sample_words(corpus, selection, STUDY_MODE, random.Random(1), prefer=[100, 7])
+    ayahs = [i for i, _ in picks]
+    assert len(set(ayahs)) == len(ayahs) == STUDY_WORD_COUNT < len(selection.indices)
+    assert {selection.indices[100], selection.indices[7]} <= set(ayahs)
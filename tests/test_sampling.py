@@ -0,0 +1,58 @@
+import random
+from collections import Counter
+
+import pytest
+
+from sampling import FenwickSampler
+
+
+@pytest.mark.parametrize("n", [1, 2, 7, 64, 100])
+def test_distinct_picks(n):
+    sampler = FenwickSampler([1.0 + i % 5 for i in range(n)])
+    rng = random.Random(n)
+    for k in (0, 1, n // 2, n, n + 3):
+        picks = sampler.sample(k, rng)
+        assert len(picks) == min(k, n)
+        assert len(set(picks)) == len(picks)
+        assert all(0 <= i < n for i in picks)
+
+
+def test_exclude():
+    sampler = FenwickSampler([1.0] * 10)
+    rng = random.Random(1)
+    for _ in range(50):
+        picks = sampler.sample(10, rng, exclude=[0, 3, 3, 9])
+        assert sorted(picks) == [1, 2, 4, 5, 6, 7, 8]
+
+
+def test_zero_weights_never_drawn():
+    sampler = FenwickSampler([0, 2, 0, 0, 5, 0])
+    rng = random.Random(2)
+    for _ in range(50):
+        assert sorted(sampler.sample(6, rng)) == [1, 4]
+    assert FenwickSampler([0, 0]).sample(2, rng) == []
+    assert FenwickSampler([]).sample(1, rng) == []
+
+
+def test_weights_restored():
+    weights = [3.0, 1.0, 0.0, 2.0]
+    sampler = FenwickSampler(weights)
+    sampler.sample(3, random.Random(3), exclude=[1])
+    assert [sampler.weight(i) for i in range(4)] == weights
+    assert sampler.total == pytest.approx(6.0)
+
+
+def test_update():
+    sampler = FenwickSampler([1.0, 1.0, 1.0])
+    sampler.update(0, 0)
+    sampler.update(2, -4)  # clamped to zero
+    assert sampler.sample(3, random.Random(4)) == [1]
+    sampler.update(2, 1.5)
+    assert sampler.total == pytest.approx(2.5)
+
+
+def test_draws_follow_weights():
+    sampler = FenwickSampler([1.0, 3.0])
+    rng = random.Random(5)
+    first = Counter(sampler.sample(1, rng)[0] for _ in range(4000))
+    assert 0.7 < first[1] / 4000 < 0.8
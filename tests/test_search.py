@@ -0,0 +1,41 @@
+import pytest
+
+from search import MIN_QUERY_LENGTH, query_length, search_index
+
+
+def _keys(corpus, query):
+    return [corpus.ayahs[i]["ayah_key"] for i in search_index(corpus).find(query)]
+
+
+@pytest.mark.parametrize("query, ayah_key", [
+    ("الله", "2:11"),    # قِيلَ لَهُمْ: across a word boundary
+    ("الله", "2:16"),    # ٱلضَّلَٰلَةَ: inside a word
+    ("لهم", "2:17"),     # مَثَلُهُمْ
+    ("آمنوا", "2:3"),    # يُؤْمِنُونَ
+])
+def test_no_match_across_or_inside_words(corpus, query, ayah_key):
+    assert ayah_key not in _keys(corpus, query)
+
+
+@pytest.mark.parametrize("query, ayah_key", [
+    ("الله", "2:7"),     # خَتَمَ ٱللَّهُ
+    ("الله", "2:8"),     # بِٱللَّهِ
+    ("لهم", "2:11"),
+    ("يا أيها الناس", "2:21"),
+    ("ذلك الكتاب لا ريب", "2:2"),
+])
+def test_finds_the_ayah(corpus, query, ayah_key):
+    assert ayah_key in _keys(corpus, query)
+
+
+def test_short_key_matches_whole_words(corpus):
+    assert query_length("قال") >= MIN_QUERY_LENGTH
+    keys = _keys(corpus, "قال")
+    assert "2:30" in keys
+    assert "2:7" not in keys     # قُلُوبِهِمْ
+
+
+def test_every_opening_finds_its_ayah(corpus):
+    index = search_index(corpus)
+    for i, ayah in enumerate(corpus.ayahs):
+        assert i in index.find(" ".join(ayah["text"].split()[:3]))
@@ -0,0 +1,128 @@
+"""Colour themes, applied per browser session with injected CSS.
+
+Switching a theme never touches ``.streamlit/config.toml``: the file only
+provides the default, read once per process.
+"""
+import functools
+from pathlib import Path
+
+import toml
+
+CONFIG_PATH = Path(__file__).parent / ".streamlit" / "config.toml"
+
+COLOR_KEYS = ("primaryColor", "backgroundColor", "secondaryBackgroundColor", "textColor")
+
+# preset themes
+THEMES = {
+    "Teal": {
+        "base": "dark",
+        "primaryColor":             "#00FFFF",
+        "backgroundColor":          "#051716",
+        "secondaryBackgroundColor": "#062422",
+        "textColor":                "#FFFFFF",
+    },
+    "Blue": {
+        "base": "dark",
+        "primaryColor":             "#0059FF",
+        "backgroundColor":          "#050917",
+        "secondaryBackgroundColor": "#060C24",
+        "textColor":                "#FFFFFF",
+    },
+    "Purple": {
+        "base": "dark",
+        "primaryColor":             "#8A00FF",
+        "backgroundColor":          "#0D0517",
+        "secondaryBackgroundColor": "#120624",
+        "textColor":                "#FFFFFF",
+    },
+    "Magenta": {
+        "base": "dark",
+        "primaryColor":             "#FF00FF",
+        "backgroundColor":          "#160517",
+        "secondaryBackgroundColor": "#220624",
+        "textColor":                "#FFFFFF",
+    },
+    "Red": {
+        "base": "dark",
+        "primaryColor":             "#FF0030",
+        "backgroundColor":          "#170506",
+        "secondaryBackgroundColor": "#240607",
+        "textColor":                "#FFFFFF",
+    },
+    "Orange": {
+        "base": "dark",
+        "primaryColor":             "#FF6600",  # more saturated orange
+        "backgroundColor":          "#1A0E03",
+        "secondaryBackgroundColor": "#261503",
+        "textColor":                "#FFFFFF",
+    },
+    "Green": {
+        "base": "dark",
+        "primaryColor":             "#00FF66",  # rich neon green
+        "backgroundColor":          "#05170B",
+        "secondaryBackgroundColor": "#062415",
+        "textColor":                "#FFFFFF",
+    },
+    "Gold": {
+        "base": "dark",
+        "primaryColor":             "#FFD700",  # true gold
+        "backgroundColor":          "#171403",
+        "secondaryBackgroundColor": "#241E06",
+        "textColor":                "#FFFFFF",  # better contrast on gold
+    },
+}
+
+
+@functools.lru_cache(maxsize=1)
+def default_theme_name(config_path=CONFIG_PATH):
+    """The preset matching ``[theme]`` in config.toml, else the first preset."""
+    try:
+        current = toml.load(config_path).get("theme", {})
+    except (OSError, toml.TomlDecodeError):
+        current = {}
+    for name, theme in THEMES.items():
+        if all(str(theme[k]).lower() == str(current.get(k, "")).lower() for k in COLOR_KEYS):
+            return name
+    return next(iter(THEMES))
+
+
+@functools.lru_cache(maxsize=None)
+def theme_css(name):
+    """A ``<style>`` block that paints the app in preset ``name``.
+
+    The colours become CSS variables on ``.stApp``, and the rules below map
+    them onto the surfaces config.toml would otherwise colour.
+    """
+    t = THEMES[name]
+    return f"""
+<style>
+.stApp {{
+  --qmt-primary: {t["primaryColor"]};
+  --qmt-bg: {t["backgroundColor"]};
+  --qmt-bg-2: {t["secondaryBackgroundColor"]};
+  --qmt-text: {t["textColor"]};
+  background-color: var(--qmt-bg) !important;
+  color: var(--qmt-text) !important;
+}}
+[data-testid="stHeader"] {{ background-color: var(--qmt-bg) !important; }}
+[data-testid="stSidebar"] > div:first-child,
+[data-testid="stSidebarContent"] {{ background-color: var(--qmt-bg-2) !important; }}
+.stApp p, .stApp label, .stApp h1, .stApp h2, .stApp h3,
+.stApp summary, .stApp li {{ color: var(--qmt-text) !important; }}
+[data-testid="stExpander"] details {{ border-color: var(--qmt-bg-2) !important; }}
+.stApp [data-baseweb="select"] > div,
+.stApp [data-baseweb="input"],
+.stApp [data-baseweb="input"] input {{ background-color: var(--qmt-bg-2) !important; }}
+.stApp [data-baseweb="tag"] {{ background-color: var(--qmt-primary) !important; }}
+.stApp [role="radio"][aria-checked="true"] > div:first-child,
+.stApp [data-baseweb="checkbox"] input:checked + div,
+.stApp [data-baseweb="slider"] [role="slider"] {{ background-color: var(--qmt-primary) !important; }}
+.stApp .stButton > button {{ background-color: var(--qmt-bg-2) !important; }}
+.stApp .stButton > button:hover,
+.stApp .stButton > button:focus {{
+  border-color: var(--qmt-primary) !important;
+  color: var(--qmt-primary) !important;
+}}
+.stApp a {{ color: var(--qmt-primary) !important; }}
+</style>
+"""
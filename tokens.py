@@ -0,0 +1,49 @@
+"""The words of every ayah, split once per process.
+
+A ``WordTable`` holds every word of the corpus (as ``arabic.words`` splits
+them) in one flat list in reading order, with per-ayah offsets into it, so
+a word and its neighbours are O(1) lookups and drills never split ayah
+texts while generating.
+"""
+import functools
+from array import array
+
+from arabic import words
+
+
+class WordTable:
+    """Words of ``corpus.ayahs``."""
+
+    def __init__(self, corpus):
+        self.words = []
+        # words of ayah i are self.words[offsets[i]:offsets[i + 1]]
+        self.offsets = array("I", [0])
+        for a in corpus.ayahs:
+            self.words.extend(words(a["text"]))
+            self.offsets.append(len(self.words))
+
+    def __len__(self):
+        return len(self.words)
+
+    def length(self, i):
+        """Number of words in ayah ``i``."""
+        return self.offsets[i + 1] - self.offsets[i]
+
+    def of(self, i):
+        """The words of ayah ``i``."""
+        return self.words[self.offsets[i]:self.offsets[i + 1]]
+
+    def word(self, i, k):
+        """Word ``k`` of ayah ``i``."""
+        return self.words[self.offsets[i] + k]
+
+    def text(self, i, start, stop):
+        """Words ``start:stop`` of ayah ``i``, joined by spaces."""
+        lo = self.offsets[i]
+        return " ".join(self.words[lo + start:lo + stop])
+
+
+@functools.lru_cache(maxsize=2)
+def word_table(corpus):
+    """The word table of ``corpus``, built once per process."""
+    return WordTable(corpus)